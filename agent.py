@@ -1,42 +1,134 @@
 """
-AI Agent with tool calling, session memory, and RAG capabilities.
+AI Agent with session memory and RAG capabilities.
 Decides whether to answer directly or use document retrieval.
 """
 
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Final, List, Optional
+import asyncio
+import functools
+import itertools
+import json
 import logging
+import re
+import threading
+import time
 import uuid
-from datetime import datetime, timedelta
+from collections import OrderedDict, deque
 
 from llm_providers import get_llm_provider
-from rag_engine import RAGEngine
+from rag_engine import get_rag_engine
+from semantic_cache import SemanticCache
+from truncation import truncate_history
 from config import get_settings
 
 logger = logging.getLogger(__name__)
 
 
+# Static prompt bodies, hoisted so they are allocated once and keep stable
+# identity for prompt-prefix caching. Only the marked slots vary per call.
+_DECISION_PROMPT_TEMPLATE: Final[str] = """You are a helpful assistant. Analyze this user query and decide if you need to search through documents to answer it, or if you can answer directly from your general knowledge.
+
+User query: "{query}"
+
+Respond with ONLY one word:
+- "SEARCH" if you need to search documents (for company-specific info, policies, products, technical details)
+- "DIRECT" if you can answer from general knowledge
+
+Response:"""
+
+_DECISION_SYSTEM_MSG: Final[str] = (
+    "You are a decision-making assistant. Respond with only SEARCH or DIRECT."
+)
+
+_CAG_SYSTEM_MSG_TEMPLATE: Final[str] = """You are a helpful AI assistant. Use the provided company documents to answer the user's question accurately. If the documents don't contain enough information, say so. Always cite the sources when providing information.
+
+Company documents:
+{corpus}"""
+
+_RAG_SYSTEM_MSG_TEMPLATE: Final[str] = """You are a helpful AI assistant. Use the provided context from documents to answer the user's question accurately. If the context doesn't contain enough information, say so. Always cite the sources when providing information.
+
+Context from documents:
+{context}
+
+Provide a clear, accurate answer based on the context above. Mention which sources you're using."""
+
+_NO_CONTEXT_SYSTEM_MSG: Final[str] = """You are a helpful AI assistant. The user asked a question but no relevant documents were found. Politely inform them that you don't have specific information about their query in the available documents, but try to provide general helpful information if possible."""
+
+_DIRECT_SYSTEM_MSG: Final[str] = """You are a helpful AI assistant. Answer the user's question clearly and concisely using your general knowledge."""
+
+_SUMMARIZE_PROMPT_TEMPLATE: Final[str] = """Summarize these conversation turns in at most 200 tokens, preserving entities, decisions, and constraints.
+
+Previous summary: {previous_summary}
+
+Turns:
+{transcript}
+
+Summary:"""
+
+_SUMMARIZE_SYSTEM_MSG: Final[str] = (
+    "You are a conversation summarizer. Respond with only the summary."
+)
+
+
 class SessionMemory:
     """Simple in-memory session storage for conversation history."""
-    
+
     def __init__(self):
-        self.sessions: Dict[str, Dict[str, Any]] = {}
+        # Ordered by recency: oldest sessions sit at the front, so eviction
+        # and expiry scans only ever touch the stale end.
+        self.sessions: OrderedDict[str, Dict[str, Any]] = OrderedDict()
         self.settings = get_settings()
-    
+        self.max_sessions = self.settings.max_sessions
+        # Above this, session creation triggers an opportunistic expiry
+        # sweep before falling back to LRU eviction
+        self.high_water = max(1, int(self.max_sessions * 0.9))
+        # Optional callable(messages, previous_summary) -> summary, set by
+        # the agent so evicted turns get compressed instead of forgotten
+        self.summarizer = None
+        # Monotonic per-message sequence number; ordering is all callers
+        # need, and an int is far cheaper than an ISO timestamp string
+        self._seq = itertools.count()
+
+    def _new_session_dict(self) -> Dict[str, Any]:
+        """Factory for blank session dicts."""
+        return {
+            # Bounded deque: appends are O(1) and the oldest message is
+            # dropped automatically once the window is full.
+            'history': deque(maxlen=self.settings.max_conversation_history * 2),
+            'summary': '',
+            # Working-memory anchor: the initial task plus explicitly
+            # pinned content, always kept regardless of truncation
+            'anchor': {'initial_query': '', 'pinned': []},
+            'created_at': 0.0,
+            'last_accessed': 0.0
+        }
+
     def get_or_create_session(self, session_id: Optional[str] = None) -> str:
         """Get existing session or create a new one."""
         if session_id and session_id in self.sessions:
-            # Update last accessed time
-            self.sessions[session_id]['last_accessed'] = datetime.now()
+            # Update last accessed time and move to the recent end
+            self.sessions[session_id]['last_accessed'] = time.monotonic()
+            self.sessions.move_to_end(session_id)
             return session_id
-        
+
+        # Opportunistically drop expired sessions once we're near the cap,
+        # so LRU eviction below only kicks in as a last resort
+        if len(self.sessions) > self.high_water:
+            self.cleanup_old_sessions()
+
         # Create new session
         new_session_id = session_id or str(uuid.uuid4())
-        self.sessions[new_session_id] = {
-            'history': [],
-            'created_at': datetime.now(),
-            'last_accessed': datetime.now()
-        }
-        logger.info(f"Created new session: {new_session_id}")
+        session = self._new_session_dict()
+        session['created_at'] = time.monotonic()
+        session['last_accessed'] = time.monotonic()
+        self.sessions[new_session_id] = session
+
+        # Enforce the hard session cap with LRU eviction
+        while len(self.sessions) > self.max_sessions:
+            evicted_id, _ = self.sessions.popitem(last=False)
+            logger.info("Evicted LRU session: %s", evicted_id)
+
+        logger.info("Created new session: %s", new_session_id)
         return new_session_id
     
     def add_message(
@@ -48,211 +140,380 @@ class SessionMemory:
         """Add a message to session history."""
         if session_id not in self.sessions:
             self.get_or_create_session(session_id)
-        
-        self.sessions[session_id]['history'].append({
+
+        session = self.sessions[session_id]
+        history = session['history']
+
+        # First user message becomes the session's task anchor
+        if role == 'user' and not session['anchor']['initial_query']:
+            session['anchor']['initial_query'] = content
+
+        # When the window is full, compress the turns that are about to
+        # fall off into the rolling summary instead of dropping them.
+        if (self.summarizer is not None
+                and history.maxlen is not None
+                and len(history) == history.maxlen):
+            popped = [history.popleft() for _ in range(min(4, len(history)))]
+            self._summarize_async(session_id, popped)
+
+        history.append({
             'role': role,
             'content': content,
-            'timestamp': datetime.now().isoformat()
+            'seq': next(self._seq)
         })
-        
-        # Keep only recent messages
-        max_history = self.settings.max_conversation_history
-        if len(self.sessions[session_id]['history']) > max_history * 2:
-            self.sessions[session_id]['history'] = \
-                self.sessions[session_id]['history'][-max_history * 2:]
-    
+
+    def _summarize_async(self, session_id: str, popped: List[Dict[str, str]]) -> None:
+        """Summarize evicted turns on a background thread (never blocks)."""
+        existing = self.sessions[session_id].get('summary', '')
+
+        def _run():
+            try:
+                summary = self.summarizer(popped, existing)
+                if session_id in self.sessions:
+                    self.sessions[session_id]['summary'] = summary.strip()
+            except Exception as e:
+                logger.error("Error summarizing conversation history: %s", e)
+
+        threading.Thread(target=_run, daemon=True).start()
+
     def get_history(self, session_id: str) -> List[Dict[str, str]]:
         """Get conversation history for a session."""
         if session_id not in self.sessions:
             return []
-        
-        return self.sessions[session_id]['history']
+
+        return list(self.sessions[session_id]['history'])
+
+    def get_summary(self, session_id: str) -> str:
+        """Get the rolling summary of older turns for a session."""
+        if session_id not in self.sessions:
+            return ''
+
+        return self.sessions[session_id].get('summary', '')
+
+    def pin(self, session_id: str, text: str) -> None:
+        """Pin content to the session anchor so it survives truncation."""
+        if session_id not in self.sessions:
+            return
+
+        self.sessions[session_id]['anchor']['pinned'].append(text)
+
+    def get_anchor(self, session_id: str) -> Dict[str, Any]:
+        """Get the working-memory anchor for a session."""
+        if session_id not in self.sessions:
+            return {'initial_query': '', 'pinned': []}
+
+        return self.sessions[session_id].get(
+            'anchor', {'initial_query': '', 'pinned': []}
+        )
     
     def cleanup_old_sessions(self) -> int:
         """Remove sessions that haven't been accessed recently."""
-        timeout = timedelta(seconds=self.settings.session_timeout)
-        now = datetime.now()
-        
-        expired_sessions = [
-            sid for sid, data in self.sessions.items()
-            if now - data['last_accessed'] > timeout
-        ]
-        
-        for sid in expired_sessions:
-            del self.sessions[sid]
-        
-        if expired_sessions:
-            logger.info(f"Cleaned up {len(expired_sessions)} expired sessions")
-        
-        return len(expired_sessions)
+        timeout = self.settings.session_timeout
+        now = time.monotonic()
+
+        # Sessions are ordered by recency, so we can stop at the first
+        # non-expired entry instead of scanning everything.
+        expired_count = 0
+        while self.sessions:
+            sid = next(iter(self.sessions))
+            if now - self.sessions[sid]['last_accessed'] <= timeout:
+                break
+            self.sessions.pop(sid)
+            expired_count += 1
+
+        if expired_count:
+            logger.info("Cleaned up %d expired sessions", expired_count)
+
+        return expired_count
 
 
 class AIAgent:
-    """AI Agent with RAG capabilities and tool calling."""
-    
-    # Define available tools
-    TOOLS = [
-        {
-            "name": "search_documents",
-            "description": "Search through company documents to find relevant information. "
-                          "Use this when the user asks about company policies, products, "
-                          "technical details, or any information that might be in the documents.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "query": {
-                        "type": "string",
-                        "description": "The search query to find relevant information"
-                    }
-                },
-                "required": ["query"]
-            }
-        }
-    ]
-    
+    """AI Agent with RAG capabilities and session memory."""
+
     def __init__(self):
         self.llm_provider = get_llm_provider()
-        self.rag_engine = RAGEngine()
+        self.rag_engine = get_rag_engine()
         self.session_memory = SessionMemory()
+        self.session_memory.summarizer = self._summarize_turns
+
+        # Utility calls (routing, summarization) are single-shot prompts
+        # with no history, so they skip the LangChain message layer when
+        # the provider exposes its raw fast path
+        self._utility_generate = getattr(
+            self.llm_provider, "generate_response_fast",
+            self.llm_provider.generate_response
+        )
+
+        # Cache routing decisions: the decision prompt is deterministic given
+        # the query text, so repeat queries (FAQ-style traffic) can skip the
+        # LLM round-trip entirely.
+        self._cached_route_decision = functools.lru_cache(maxsize=4096)(
+            self._llm_route_decision
+        )
+
+        # Keyword classifier for routing: queries that clearly mention
+        # company/document topics go straight to RAG without an LLM call.
+        self._rag_keywords = re.compile(
+            r"\b(policy|policies|product|faq|pricing|price|doc|docs|document|"
+            r"manual|sop|company|internal|procedure|how do i)\b",
+            re.IGNORECASE
+        )
+        self._question_words = re.compile(
+            r"\b(what|why|how|when|where|who|which|explain|describe)\b",
+            re.IGNORECASE
+        )
+
+        # Semantic response cache: paraphrased repeats of a question reuse
+        # the cached answer instead of re-running retrieval + generation.
+        settings = get_settings()
+        self.settings = settings
+        self.semantic_cache: Optional[SemanticCache] = None
+        embedding_model = getattr(
+            self.rag_engine.vector_store, 'embedding_model', None
+        )
+        if settings.semantic_cache_enabled and embedding_model is not None:
+            self.semantic_cache = SemanticCache(
+                embedding_model=embedding_model,
+                threshold=settings.semantic_cache_threshold,
+                ttl=settings.semantic_cache_ttl,
+                max_entries=settings.semantic_cache_max_entries
+            )
+            # Also shield raw provider calls (routing, summarization) that
+            # bypass the agent-level cache
+            if hasattr(self.llm_provider, 'set_response_cache'):
+                self.llm_provider.set_response_cache(embedding_model)
+
+        # Cache Augmented Generation: when the indexed corpus is small
+        # enough, ship it whole as a stable prompt prefix and skip both
+        # routing and retrieval on every query.
+        self._cag_mode = False
+        self._cag_system_msg = ""
+        if settings.enable_cag:
+            corpus_tokens = self.rag_engine.total_tokens()
+            if 0 < corpus_tokens <= settings.cag_token_budget:
+                self._cag_mode = True
+                self._cag_system_msg = _CAG_SYSTEM_MSG_TEMPLATE.format(
+                    corpus=self.rag_engine.dump_all_chunks_sorted()
+                )
+                logger.info("CAG mode enabled (~%d corpus tokens)", corpus_tokens)
+
         logger.info("Initialized AI Agent")
-    
+
+    def _llm_route_decision(self, query_norm: str) -> bool:
+        """Ask the LLM whether a (normalized) query needs document search."""
+        response = self._utility_generate(
+            prompt=_DECISION_PROMPT_TEMPLATE.format(query=query_norm),
+            system_message=_DECISION_SYSTEM_MSG
+        )
+
+        decision = response.strip().upper()
+        logger.info("Decision for query: %s", decision)
+
+        return "SEARCH" in decision
+
+    def _summarize_turns(
+        self,
+        messages: List[Dict[str, str]],
+        previous_summary: str
+    ) -> str:
+        """Compress evicted conversation turns into a short running summary."""
+        transcript = "\n".join(
+            f"{msg['role']}: {msg['content']}" for msg in messages
+        )
+
+        prompt = _SUMMARIZE_PROMPT_TEMPLATE.format(
+            previous_summary=previous_summary or '(none)',
+            transcript=transcript
+        )
+
+        return self._utility_generate(
+            prompt=prompt,
+            system_message=_SUMMARIZE_SYSTEM_MSG
+        )
+
     def _should_use_rag(self, query: str) -> bool:
         """
         Decide if the query requires RAG or can be answered directly.
-        Uses a simple LLM call to make the decision.
+        Tries a cheap local keyword classifier first; only ambiguous queries
+        fall back to the (LRU-cached) LLM decision call.
         """
-        decision_prompt = f"""You are a helpful assistant. Analyze this user query and decide if you need to search through documents to answer it, or if you can answer directly from your general knowledge.
-
-User query: "{query}"
+        # Clear domain-term match -> search documents
+        if self._rag_keywords.search(query):
+            logger.info("Routing via keyword match: SEARCH")
+            return True
 
-Respond with ONLY one word:
-- "SEARCH" if you need to search documents (for company-specific info, policies, products, technical details)
-- "DIRECT" if you can answer from general knowledge
+        # Short query with no question words -> answer directly
+        if len(query) < 40 and not self._question_words.search(query):
+            logger.info("Routing via heuristic: DIRECT")
+            return False
 
-Response:"""
-        
+        # Ambiguous: fall back to the LLM decision
         try:
-            response = self.llm_provider.generate_response(
-                prompt=decision_prompt,
-                system_message="You are a decision-making assistant. Respond with only SEARCH or DIRECT."
-            )
-            
-            decision = response.strip().upper()
-            logger.info(f"Decision for query: {decision}")
-            
-            return "SEARCH" in decision
+            return self._cached_route_decision(query.strip().lower())
         except Exception as e:
-            logger.error(f"Error in decision making: {e}")
+            logger.error("Error in decision making: %s", e)
             # Default to using RAG if unsure
             return True
     
-    def _execute_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
-        """Execute a tool and return results."""
-        if tool_name == "search_documents":
-            query = arguments.get("query", "")
-            chunks = self.rag_engine.retrieve_context(query)
-            context = self.rag_engine.format_context(chunks)
-            sources = self.rag_engine.get_sources(chunks)
-            
-            return {
-                "context": context,
-                "sources": sources,
-                "chunks_found": len(chunks)
-            }
+    def _assemble_history(
+        self,
+        query: str,
+        session_id: str
+    ) -> List[Dict[str, str]]:
+        """
+        Build the LLM-facing history: the task anchor, the rolling summary
+        of older turns, then the token-budgeted recent turns.
+        """
+        history = self.session_memory.get_history(session_id)
+
+        # Recent turns (token-budgeted, not message-counted) plus the
+        # rolling summary of everything older, so early context survives
+        # window truncation
+        recent_history = truncate_history(
+            history, self.settings.history_token_budget
+        )
+        summary = self.session_memory.get_summary(session_id)
+        if summary:
+            recent_history = [{
+                'role': 'system',
+                'content': f'Summary of earlier conversation: {summary}'
+            }] + recent_history
+
+        # The anchor (initial task + pinned content) is always prepended,
+        # so it can never be truncated away
+        anchor = self.session_memory.get_anchor(session_id)
+        if anchor['initial_query'] and anchor['initial_query'] != query:
+            anchor_content = f"Task anchor: {anchor['initial_query']}"
+            if anchor['pinned']:
+                anchor_content += "\nPinned: " + "; ".join(anchor['pinned'])
+            recent_history = [{
+                'role': 'system',
+                'content': anchor_content
+            }] + recent_history
+
+        return recent_history
+
+    async def _prepare_turn(self, query: str, session_id: str):
+        """
+        Shared pre-generation work for the blocking and streaming paths:
+        history assembly, routing, speculative retrieval, and system
+        message selection.
+
+        Returns:
+            Tuple of (recent_history, system_message, sources, use_rag)
+        """
+        recent_history = self._assemble_history(query, session_id)
+
+        # Decide whether to use RAG (CAG mode needs no routing decision).
+        # The routing call and a speculative retrieval fire concurrently;
+        # if the route comes back DIRECT the retrieved chunks are discarded.
+        chunks: List[Dict[str, Any]] = []
+        if self._cag_mode:
+            use_rag = False
         else:
-            logger.warning(f"Unknown tool: {tool_name}")
-            return {"error": f"Unknown tool: {tool_name}"}
-    
-    def process_query(
-        self, 
-        query: str, 
+            use_rag, chunks = await asyncio.gather(
+                asyncio.to_thread(self._should_use_rag, query),
+                asyncio.to_thread(self.rag_engine.retrieve_context, query)
+            )
+
+        sources: List[str] = []
+        if self._cag_mode:
+            logger.info("Answering in CAG mode with full corpus prefix")
+            system_message = self._cag_system_msg
+        elif use_rag and chunks:
+            logger.info("Using RAG for query")
+            # Context was already retrieved speculatively above.
+            # Cache-friendly layout: static instructions + document context
+            # form a stable prefix, only the user query varies per turn.
+            context, sources = self.rag_engine.format_context_with_sources(chunks)
+            system_message = _RAG_SYSTEM_MSG_TEMPLATE.format(context=context)
+        elif use_rag:
+            logger.info("Using RAG for query but no relevant documents found")
+            system_message = _NO_CONTEXT_SYSTEM_MSG
+        else:
+            logger.info("Answering directly without RAG")
+            system_message = _DIRECT_SYSTEM_MSG
+
+        return recent_history, system_message, sources, use_rag
+
+    async def process_query(
+        self,
+        query: str,
         session_id: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Process a user query and generate a response.
-        
+
+        The routing decision and a speculative context retrieval run
+        concurrently, so the worst-case pre-generation latency is the
+        slower of the two rather than their sum.
+
         Args:
             query: The user's question
             session_id: Optional session ID for conversation continuity
-        
+
         Returns:
             Dictionary containing answer, sources, and session info
         """
         # Get or create session
         session_id = self.session_memory.get_or_create_session(session_id)
-        
+
         # Add user message to history
         self.session_memory.add_message(session_id, "user", query)
-        
-        # Get conversation history
-        history = self.session_memory.get_history(session_id)
-        
-        # Decide whether to use RAG
-        use_rag = self._should_use_rag(query)
-        
-        sources = []
-        answer = ""
-        
-        try:
-            if use_rag:
-                logger.info("Using RAG for query")
-                
-                # Retrieve relevant context
-                chunks = self.rag_engine.retrieve_context(query)
-                context = self.rag_engine.format_context(chunks)
-                sources = self.rag_engine.get_sources(chunks)
-                
-                if not chunks:
-                    # No relevant documents found
-                    system_message = """You are a helpful AI assistant. The user asked a question but no relevant documents were found. Politely inform them that you don't have specific information about their query in the available documents, but try to provide general helpful information if possible."""
-                    
-                    answer = self.llm_provider.generate_response(
-                        prompt=query,
-                        system_message=system_message,
-                        conversation_history=history[-10:]  # Last 5 exchanges
-                    )
-                else:
-                    # Generate answer using retrieved context
-                    system_message = """You are a helpful AI assistant. Use the provided context from documents to answer the user's question accurately. If the context doesn't contain enough information, say so. Always cite the sources when providing information."""
-                    
-                    enhanced_prompt = f"""Context from documents:
-{context}
 
-User question: {query}
+        # Check the semantic cache before doing any LLM work; the lookup
+        # embeds the query, so it runs on a worker thread to keep the
+        # encode off the event loop
+        if self.semantic_cache is not None:
+            cached = await asyncio.to_thread(self.semantic_cache.get, query)
+            if cached is not None:
+                self.session_memory.add_message(
+                    session_id, "assistant", cached["answer"]
+                )
+                return {
+                    "answer": cached["answer"],
+                    "sources": cached.get("sources", []),
+                    "session_id": session_id,
+                    "used_rag": cached.get("used_rag", False)
+                }
 
-Please provide a clear, accurate answer based on the context above. Mention which sources you're using."""
-                    
-                    answer = self.llm_provider.generate_response(
-                        prompt=enhanced_prompt,
-                        system_message=system_message,
-                        conversation_history=history[-10:]
-                    )
-            else:
-                logger.info("Answering directly without RAG")
-                
-                # Answer directly without RAG
-                system_message = """You are a helpful AI assistant. Answer the user's question clearly and concisely using your general knowledge."""
-                
-                answer = self.llm_provider.generate_response(
+        try:
+            recent_history, system_message, sources, use_rag = \
+                await self._prepare_turn(query, session_id)
+
+            answer = await asyncio.wait_for(
+                asyncio.to_thread(
+                    self.llm_provider.generate_response,
                     prompt=query,
                     system_message=system_message,
-                    conversation_history=history[-10:]
-                )
-            
+                    conversation_history=recent_history
+                ),
+                timeout=self.settings.llm_request_timeout
+            )
+
             # Add assistant response to history
             self.session_memory.add_message(session_id, "assistant", answer)
-            
+
+            # Store in the semantic cache for future paraphrased queries
+            # (also an embed, so also off the event loop)
+            if self.semantic_cache is not None:
+                await asyncio.to_thread(self.semantic_cache.store, query, {
+                    "answer": answer,
+                    "sources": sources,
+                    "used_rag": use_rag
+                })
+
             return {
                 "answer": answer,
                 "sources": sources,
                 "session_id": session_id,
                 "used_rag": use_rag
             }
-        
+
         except Exception as e:
-            logger.error(f"Error processing query: {e}")
+            logger.error("Error processing query: %s", e)
             error_message = "I apologize, but I encountered an error while processing your question. Please try again."
-            
+
             return {
                 "answer": error_message,
                 "sources": [],
@@ -260,7 +521,100 @@ Please provide a clear, accurate answer based on the context above. Mention whic
                 "used_rag": False,
                 "error": str(e)
             }
-    
+
+    async def process_query_stream(
+        self,
+        query: str,
+        session_id: Optional[str] = None
+    ):
+        """
+        Streaming variant of process_query.
+
+        Yields NDJSON lines: one {"delta": token} line per generated text
+        chunk, followed by a final line with sources and session info.
+        Time-to-first-token drops to the provider's streaming latency
+        instead of the full generation time.
+        """
+        # Get or create session
+        session_id = self.session_memory.get_or_create_session(session_id)
+
+        # Add user message to history
+        self.session_memory.add_message(session_id, "user", query)
+
+        # Semantic cache hits stream back as a single delta; the lookup
+        # embeds the query, so it runs on a worker thread
+        if self.semantic_cache is not None:
+            cached = await asyncio.to_thread(self.semantic_cache.get, query)
+            if cached is not None:
+                self.session_memory.add_message(
+                    session_id, "assistant", cached["answer"]
+                )
+                yield json.dumps({"delta": cached["answer"]}) + "\n"
+                yield json.dumps({
+                    "sources": cached.get("sources", []),
+                    "session_id": session_id,
+                    "used_rag": cached.get("used_rag", False)
+                }) + "\n"
+                return
+
+        try:
+            recent_history, system_message, sources, use_rag = \
+                await self._prepare_turn(query, session_id)
+
+            stream = self.llm_provider.generate_response_stream(
+                prompt=query,
+                system_message=system_message,
+                conversation_history=recent_history
+            )
+
+            parts: List[str] = []
+            sentinel = object()
+            completed = False
+            try:
+                while True:
+                    # Pull from the sync generator off the event loop
+                    token = await asyncio.to_thread(next, stream, sentinel)
+                    if token is sentinel:
+                        completed = True
+                        break
+                    parts.append(token)
+                    yield json.dumps({"delta": token}) + "\n"
+            finally:
+                # Finalize history even if the client bails out, but only
+                # cache fully streamed answers — a disconnect mid-stream
+                # would otherwise pin a truncated response in the cache
+                answer = "".join(parts)
+                if answer:
+                    self.session_memory.add_message(
+                        session_id, "assistant", answer
+                    )
+                    if completed and self.semantic_cache is not None:
+                        await asyncio.to_thread(
+                            self.semantic_cache.store, query, {
+                                "answer": answer,
+                                "sources": sources,
+                                "used_rag": use_rag
+                            }
+                        )
+
+            yield json.dumps({
+                "sources": sources,
+                "session_id": session_id,
+                "used_rag": use_rag
+            }) + "\n"
+
+        except Exception as e:
+            logger.error("Error processing streaming query: %s", e)
+            yield json.dumps({
+                "error": str(e),
+                "session_id": session_id
+            }) + "\n"
+
     def cleanup_sessions(self) -> int:
         """Clean up expired sessions."""
+        cache_info = self._cached_route_decision.cache_info()
+        logger.info(
+            "Route decision cache: %d hits, %d misses",
+            cache_info.hits, cache_info.misses
+        )
         return self.session_memory.cleanup_old_sessions()
@@ -4,6 +4,7 @@ Loads environment variables and provides centralized config access.
 """
 
 import os
+from functools import cached_property, lru_cache
 from typing import Literal
 from pydantic_settings import BaseSettings
 from pydantic import Field
@@ -35,6 +36,15 @@ class Settings(BaseSettings):
         description="Azure OpenAI API version"
     )
     
+    max_concurrent_llm: int = Field(
+        default=8,
+        description="Max in-flight LLM requests (async path concurrency cap)"
+    )
+    llm_request_timeout: int = Field(
+        default=60,
+        description="Per-request LLM timeout in seconds"
+    )
+
     # Vector Store Configuration
     vector_store: Literal["faiss", "pinecone", "azure_search"] = Field(
         default="faiss",
@@ -46,6 +56,18 @@ class Settings(BaseSettings):
         default="./vector_store/faiss_index",
         description="Path to FAISS index"
     )
+    embedding_quantization: Literal["fp32", "fp16", "int8"] = Field(
+        default="int8",
+        description="Storage precision for FAISS vectors"
+    )
+    use_onnx_embedder: bool = Field(
+        default=False,
+        description="Serve embeddings via ONNX Runtime (needs optimum[onnxruntime])"
+    )
+    compute_threads: int = Field(
+        default=0,
+        description="Threads for torch/FAISS CPU kernels (0 = CPU count - 1)"
+    )
     
     # Pinecone
     pinecone_api_key: str = Field(default="", description="Pinecone API key")
@@ -77,13 +99,66 @@ class Settings(BaseSettings):
         default=5,
         description="Maximum chunks to retrieve for context"
     )
+    embedding_batch_size: int = Field(
+        default=64,
+        description="Chunks per vector-store flush during document processing"
+    )
     
+    # Cache Augmented Generation (CAG)
+    enable_cag: bool = Field(
+        default=False,
+        description="Pack small corpora into the prompt instead of retrieving"
+    )
+    cag_token_budget: int = Field(
+        default=50000,
+        description="Max estimated corpus tokens for CAG mode"
+    )
+
+    # Semantic Cache
+    semantic_cache_enabled: bool = Field(
+        default=True,
+        description="Enable semantic response caching for /ask queries"
+    )
+    semantic_cache_threshold: float = Field(
+        default=0.95,
+        description="Cosine similarity threshold for semantic cache hits"
+    )
+    semantic_cache_ttl: int = Field(
+        default=3600,
+        description="Semantic cache entry TTL in seconds"
+    )
+    semantic_cache_max_entries: int = Field(
+        default=1024,
+        description="Maximum entries in the semantic cache"
+    )
+
+    response_cache_threshold: float = Field(
+        default=0.95,
+        description="Similarity threshold for the provider-level response cache"
+    )
+
     # Session Configuration
     session_timeout: int = Field(default=3600, description="Session timeout in seconds")
+    max_sessions: int = Field(
+        default=1000,
+        description="Hard cap on concurrently stored sessions (LRU eviction)"
+    )
+    session_cleanup_interval: int = Field(
+        default=300,
+        description="Seconds between periodic background session cleanups"
+    )
     max_conversation_history: int = Field(
         default=10,
         description="Max conversation turns to keep in memory"
     )
+    history_token_budget: int = Field(
+        default=2000,
+        description="Token budget for conversation history sent to the LLM"
+    )
+    history_window: int = Field(
+        default=6,
+        description="Max conversation turns forwarded to the LLM per request"
+    )
     
     # CORS Settings
     allowed_origins: str = Field(
@@ -96,26 +171,31 @@ class Settings(BaseSettings):
         env_file_encoding = "utf-8"
         case_sensitive = False
     
-    def get_allowed_origins_list(self) -> list[str]:
-        """Parse allowed origins into a list."""
+    # Settings are effectively immutable after construction, so these
+    # derived values are computed once and then served as attribute reads.
+    @cached_property
+    def allowed_origins_list(self) -> list[str]:
+        """Parsed list of allowed CORS origins."""
         return [origin.strip() for origin in self.allowed_origins.split(",")]
-    
-    def validate_llm_config(self) -> bool:
-        """Validate that required LLM provider credentials are present."""
+
+    @cached_property
+    def llm_config_valid(self) -> bool:
+        """Whether required LLM provider credentials are present."""
         if self.llm_provider == "google":
             return bool(self.google_api_key)
         elif self.llm_provider == "openai":
             return bool(self.openai_api_key)
         elif self.llm_provider == "azure_openai":
             return bool(
-                self.azure_openai_api_key 
-                and self.azure_openai_endpoint 
+                self.azure_openai_api_key
+                and self.azure_openai_endpoint
                 and self.azure_openai_deployment_name
             )
         return False
-    
-    def validate_vector_store_config(self) -> bool:
-        """Validate that required vector store credentials are present."""
+
+    @cached_property
+    def vector_store_config_valid(self) -> bool:
+        """Whether required vector store credentials are present."""
         if self.vector_store == "faiss":
             return True  # FAISS doesn't need credentials
         elif self.vector_store == "pinecone":
@@ -125,10 +205,11 @@ class Settings(BaseSettings):
         return False
 
 
-# Global settings instance
-settings = Settings()
-
-
+@lru_cache(maxsize=1)
 def get_settings() -> Settings:
-    """Get the global settings instance."""
-    return settings
+    """
+    Get the settings singleton.
+    Built lazily on first call; tests can override environment variables
+    and call get_settings.cache_clear() to rebuild.
+    """
+    return Settings()
@@ -4,8 +4,13 @@ Default is Google Gemini (free), with commented code for switching providers.
 """
 
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
+from functools import lru_cache
+from typing import Dict, Any, List, Optional
+import asyncio
+import hashlib
 import logging
+import re
+import threading
 
 # Google Gemini (Default)
 import google.generativeai as genai
@@ -21,9 +26,114 @@ from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 # from langchain_openai import ChatOpenAI, AzureChatOpenAI
 
 from config import get_settings
+from semantic_cache import SemanticCache
 
 logger = logging.getLogger(__name__)
 
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=8)
+def _tool_catalog(tools_key: tuple) -> str:
+    """
+    Render the tool catalog for a (name, description) tuple key.
+    The catalog is static across a session, so memoizing keeps the
+    rendered string byte-identical for prompt-prefix caching too.
+    """
+    return "\n".join(
+        f"- {name}: {description}" for name, description in tools_key
+    )
+
+
+class SemanticResponseCache:
+    """
+    Semantic cache sitting in front of generate_response.
+
+    Prompts are only comparable when they share the same system message
+    and conversation history, so entries are partitioned into one small
+    SemanticCache per (system_message, history) context and the lookup
+    embeds the canonicalized prompt alone. It only pays off for
+    history-free calls with a stable system message (e.g. a session's
+    first turn); the main answer path is covered by the agent-level
+    cache and would just pay two extra embeds per miss here.
+    """
+
+    def __init__(
+        self,
+        embedding_model,
+        threshold: float = 0.95,
+        ttl: int = 3600,
+        max_entries: int = 256
+    ):
+        self.embedding_model = embedding_model
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # Bounded registry of per-context caches (insertion-ordered dict;
+        # oldest context is dropped once full). Callers run on worker
+        # threads, so registry mutations are locked; the per-context
+        # caches carry their own locks.
+        self._contexts: Dict[str, SemanticCache] = {}
+        self._max_contexts = 128
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _canonicalize(prompt: str) -> str:
+        """Normalize whitespace and case so trivial rephrasings collide."""
+        return _WHITESPACE_RE.sub(" ", prompt).strip().lower()
+
+    @staticmethod
+    def _context_key(
+        system_message: str,
+        conversation_history: Optional[List[Dict[str, str]]]
+    ) -> str:
+        """Digest of everything besides the prompt that shapes the answer."""
+        h = hashlib.blake2b(digest_size=16)
+        h.update(system_message.encode())
+        for msg in conversation_history or []:
+            h.update(msg["role"].encode())
+            h.update(msg["content"].encode())
+        return h.hexdigest()
+
+    def get(
+        self,
+        prompt: str,
+        system_message: str = "",
+        conversation_history: Optional[List[Dict[str, str]]] = None
+    ) -> Optional[str]:
+        """Return a cached answer for a similar prompt in the same context."""
+        with self._lock:
+            cache = self._contexts.get(
+                self._context_key(system_message, conversation_history)
+            )
+        if cache is None:
+            return None
+        hit = cache.get(self._canonicalize(prompt))
+        return hit["answer"] if hit else None
+
+    def store(
+        self,
+        prompt: str,
+        answer: str,
+        system_message: str = "",
+        conversation_history: Optional[List[Dict[str, str]]] = None
+    ) -> None:
+        """Cache an answer under its (context, prompt) pair."""
+        key = self._context_key(system_message, conversation_history)
+        with self._lock:
+            cache = self._contexts.get(key)
+            if cache is None:
+                if len(self._contexts) >= self._max_contexts:
+                    self._contexts.pop(next(iter(self._contexts)))
+                cache = SemanticCache(
+                    self.embedding_model,
+                    threshold=self.threshold,
+                    ttl=self.ttl,
+                    max_entries=self.max_entries
+                )
+                self._contexts[key] = cache
+        cache.store(self._canonicalize(prompt), {"answer": answer})
+
 
 class BaseLLMProvider(ABC):
     """Base class for LLM providers."""
@@ -38,6 +148,26 @@ class BaseLLMProvider(ABC):
         """Generate a response from the LLM."""
         pass
     
+    @abstractmethod
+    def generate_response_stream(
+        self,
+        prompt: str,
+        system_message: str = "",
+        conversation_history: List[Dict[str, str]] = None
+    ):
+        """Generate a response as a stream of text chunks."""
+        pass
+
+    @abstractmethod
+    async def agenerate_response(
+        self,
+        prompt: str,
+        system_message: str = "",
+        conversation_history: List[Dict[str, str]] = None
+    ) -> str:
+        """Generate a response from the LLM without blocking the event loop."""
+        pass
+
     @abstractmethod
     def generate_with_tools(
         self,
@@ -48,6 +178,16 @@ class BaseLLMProvider(ABC):
         """Generate a response with tool calling capability."""
         pass
 
+    @abstractmethod
+    async def agenerate_with_tools(
+        self,
+        prompt: str,
+        tools: List[Dict[str, Any]],
+        system_message: str = ""
+    ) -> Dict[str, Any]:
+        """Async variant of generate_with_tools."""
+        pass
+
 
 class GoogleGeminiProvider(BaseLLMProvider):
     """Google Gemini LLM provider (Default - Free)."""
@@ -57,43 +197,213 @@ class GoogleGeminiProvider(BaseLLMProvider):
         genai.configure(api_key=settings.google_api_key)
         
         # Using LangChain for consistency
+        # The SDK speaks gRPC over a single shared HTTP/2 channel, so
+        # connection reuse and request multiplexing come from holding one
+        # provider instance (see get_llm_provider) rather than an httpx
+        # pool. convert_system_message_to_human is required by the pinned
+        # langchain-google-genai: without it any SystemMessage raises.
         self.llm = ChatGoogleGenerativeAI(
             model=settings.google_model,
             google_api_key=settings.google_api_key,
             temperature=0.7,
             convert_system_message_to_human=True
         )
+        # Caps in-flight async requests so bursts don't trip provider-side
+        # rate limits; sync callers are naturally serialized per thread
+        self._semaphore = asyncio.Semaphore(settings.max_concurrent_llm)
+        self._timeout = settings.llm_request_timeout
+        # Optional semantic response cache, attached via set_response_cache
+        # by a caller that owns an embedding model
+        self.response_cache: Optional[SemanticResponseCache] = None
+        # Single raw SDK model for the fast path below; the pinned SDK has
+        # no system_instruction support, so the system message is folded
+        # into the first user turn there instead
+        self._genai_model = genai.GenerativeModel(settings.google_model)
         logger.info("Initialized Google Gemini provider")
+
+    def set_response_cache(self, embedding_model) -> None:
+        """Enable semantic response caching using the given embedding model."""
+        settings = get_settings()
+        self.response_cache = SemanticResponseCache(
+            embedding_model,
+            threshold=settings.response_cache_threshold,
+            ttl=settings.semantic_cache_ttl
+        )
     
-    def generate_response(
-        self, 
-        prompt: str, 
+    def _build_messages(
+        self,
+        prompt: str,
         system_message: str = "",
         conversation_history: List[Dict[str, str]] = None
-    ) -> str:
-        """Generate a response using Google Gemini."""
-        messages = []
-        
-        if system_message:
-            messages.append(SystemMessage(content=system_message))
-        
-        # Add conversation history if provided
+    ) -> list:
+        """Build the LangChain message list for a request."""
+        # The provider only accepts a single leading SystemMessage, so
+        # system-role history entries (the rolling summary, the task
+        # anchor) are folded into the system block instead of appearing
+        # mid-list, where the pinned langchain-google-genai rejects them
+        system_parts = [system_message] if system_message else []
+        turns = []
+
+        # Add conversation history if provided, clamped to the last
+        # history_window turns so prompt size (and latency) stays constant
+        # as a conversation grows. System entries are pulled out before
+        # the clamp: the agent prepends them, which is exactly where a
+        # tail slice would cut first.
         if conversation_history:
             for msg in conversation_history:
                 if msg["role"] == "user":
-                    messages.append(HumanMessage(content=msg["content"]))
+                    turns.append(HumanMessage(content=msg["content"]))
                 elif msg["role"] == "assistant":
-                    messages.append(AIMessage(content=msg["content"]))
-        
+                    turns.append(AIMessage(content=msg["content"]))
+                elif msg["role"] == "system":
+                    system_parts.append(msg["content"])
+            turns = turns[-2 * get_settings().history_window:]
+
+        messages = []
+        if system_parts:
+            messages.append(SystemMessage(content="\n\n".join(system_parts)))
+        messages.extend(turns)
         messages.append(HumanMessage(content=prompt))
-        
+        return messages
+
+    def generate_response(
+        self,
+        prompt: str,
+        system_message: str = "",
+        conversation_history: List[Dict[str, str]] = None
+    ) -> str:
+        """Generate a response using Google Gemini."""
+        # Cache only history-free calls: with history in play every turn
+        # lands in a fresh partition, so the main path would pay two
+        # embedding passes for near-zero hits
+        use_cache = self.response_cache is not None and not conversation_history
+        if use_cache:
+            cached = self.response_cache.get(prompt, system_message)
+            if cached is not None:
+                return cached
+
+        messages = self._build_messages(prompt, system_message, conversation_history)
+
         try:
             response = self.llm.invoke(messages)
-            return response.content
         except Exception as e:
             logger.error(f"Error generating response with Gemini: {e}")
             raise
+
+        if use_cache:
+            self.response_cache.store(prompt, response.content, system_message)
+        return response.content
+
+    def generate_response_fast(
+        self,
+        prompt: str,
+        system_message: str = "",
+        conversation_history: List[Dict[str, str]] = None
+    ) -> str:
+        """
+        Generate a response via the raw google-generativeai SDK.
+
+        Skips the LangChain message layer (one pydantic model per turn)
+        and passes plain role/parts dicts straight to generate_content.
+        The pinned SDK has no system-instruction support, so the system
+        message is folded into the first user turn, mirroring what
+        convert_system_message_to_human does on the LangChain path.
+        """
+        system_parts = [system_message] if system_message else []
+        turns = []
+        if conversation_history:
+            for msg in conversation_history:
+                if msg["role"] == "system":
+                    # Summary/anchor entries join the system preamble
+                    system_parts.append(msg["content"])
+                else:
+                    role = "model" if msg["role"] == "assistant" else "user"
+                    turns.append({"role": role, "parts": [msg["content"]]})
+            # Clamp after the system entries are extracted so the window
+            # only ever trims real turns
+            turns = turns[-2 * get_settings().history_window:]
+
+        contents = []
+        if system_parts:
+            contents.append({"role": "user", "parts": ["\n\n".join(system_parts)]})
+            contents.append({"role": "model", "parts": ["Understood."]})
+        contents.extend(turns)
+        contents.append({"role": "user", "parts": [prompt]})
+
+        try:
+            response = self._genai_model.generate_content(contents)
+            return response.text
+        except Exception as e:
+            logger.error("Error generating response with Gemini (fast path): %s", e)
+            raise
+
+    async def agenerate_response(
+        self,
+        prompt: str,
+        system_message: str = "",
+        conversation_history: List[Dict[str, str]] = None
+    ) -> str:
+        """
+        Generate a response using Google Gemini without blocking the event loop.
+        Concurrent calls overlap their network round-trips, bounded by the
+        max_concurrent_llm semaphore.
+        """
+        messages = self._build_messages(prompt, system_message, conversation_history)
+
+        try:
+            async with self._semaphore:
+                # The pinned provider ignores client-side timeouts, so the
+                # deadline is enforced here; a wedged call would otherwise
+                # pin a semaphore slot indefinitely
+                response = await asyncio.wait_for(
+                    self.llm.ainvoke(messages), timeout=self._timeout
+                )
+            return response.content
+        except Exception as e:
+            logger.error("Error generating response with Gemini: %s", e)
+            raise
+
+    def generate_response_stream(
+        self,
+        prompt: str,
+        system_message: str = "",
+        conversation_history: List[Dict[str, str]] = None
+    ):
+        """Generate a response as a stream of text chunks using Gemini."""
+        messages = self._build_messages(prompt, system_message, conversation_history)
+
+        try:
+            for chunk in self.llm.stream(messages):
+                if chunk.content:
+                    yield chunk.content
+        except Exception as e:
+            logger.error(f"Error streaming response with Gemini: {e}")
+            raise
     
+    def _build_tool_messages(
+        self,
+        prompt: str,
+        tools: List[Dict[str, Any]],
+        system_message: str = ""
+    ) -> list:
+        """Build the message list for a tool-calling request."""
+        # Note: Gemini's tool calling is different from OpenAI
+        # This is a simplified implementation
+        tool_descriptions = _tool_catalog(
+            tuple((tool['name'], tool['description']) for tool in tools)
+        )
+
+        # Static-first layout: the system prompt and tool catalog form a
+        # byte-stable prefix (eligible for provider prompt caching) and the
+        # dynamic user prompt always comes last.
+        system_block = f"{system_message}\n\nAvailable tools:\n{tool_descriptions}" \
+            if system_message else f"Available tools:\n{tool_descriptions}"
+
+        return [
+            SystemMessage(content=system_block),
+            HumanMessage(content=prompt)
+        ]
+
     def generate_with_tools(
         self,
         prompt: str,
@@ -101,22 +411,8 @@ class GoogleGeminiProvider(BaseLLMProvider):
         system_message: str = ""
     ) -> Dict[str, Any]:
         """Generate response with tool calling (simplified for Gemini)."""
-        # Note: Gemini's tool calling is different from OpenAI
-        # This is a simplified implementation
-        messages = []
-        
-        if system_message:
-            messages.append(SystemMessage(content=system_message))
-        
-        # Add tool descriptions to the prompt
-        tool_descriptions = "\n".join([
-            f"- {tool['name']}: {tool['description']}"
-            for tool in tools
-        ])
-        
-        enhanced_prompt = f"{prompt}\n\nAvailable tools:\n{tool_descriptions}"
-        messages.append(HumanMessage(content=enhanced_prompt))
-        
+        messages = self._build_tool_messages(prompt, tools, system_message)
+
         try:
             response = self.llm.invoke(messages)
             return {
@@ -127,6 +423,28 @@ class GoogleGeminiProvider(BaseLLMProvider):
             logger.error(f"Error with tool calling in Gemini: {e}")
             raise
 
+    async def agenerate_with_tools(
+        self,
+        prompt: str,
+        tools: List[Dict[str, Any]],
+        system_message: str = ""
+    ) -> Dict[str, Any]:
+        """Async variant of generate_with_tools using Gemini."""
+        messages = self._build_tool_messages(prompt, tools, system_message)
+
+        try:
+            async with self._semaphore:
+                response = await asyncio.wait_for(
+                    self.llm.ainvoke(messages), timeout=self._timeout
+                )
+            return {
+                "response": response.content,
+                "tool_calls": []  # Simplified - parse from response if needed
+            }
+        except Exception as e:
+            logger.error("Error with tool calling in Gemini: %s", e)
+            raise
+
 
 # Uncomment below to use OpenAI
 """
@@ -312,8 +630,13 @@ class AzureOpenAIProvider(BaseLLMProvider):
 """
 
 
+@lru_cache(maxsize=1)
 def get_llm_provider() -> BaseLLMProvider:
-    """Factory function to get the configured LLM provider."""
+    """
+    Factory for the process-lifetime LLM provider singleton.
+    Reusing one instance keeps the underlying HTTP client (and its
+    connection pool) warm across requests.
+    """
     settings = get_settings()
     
     if settings.llm_provider == "google":
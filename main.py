@@ -6,9 +6,10 @@ Provides REST API endpoints and serves the frontend.
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi.responses import HTMLResponse, FileResponse, ORJSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
 from typing import Optional, List
+import asyncio
 import logging
 import os
 from contextlib import asynccontextmanager
@@ -21,12 +22,25 @@ logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
+# The log format never uses thread/process fields; skip collecting them
+logging.logThreads = False
+logging.logProcesses = False
 logger = logging.getLogger(__name__)
 
 # Global agent instance
 agent: Optional[AIAgent] = None
 
 
+async def _periodic_cleanup(agent: AIAgent, interval: int):
+    """Periodically evict expired sessions so memory stays bounded."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            agent.cleanup_sessions()
+        except Exception as e:
+            logger.error("Error in periodic session cleanup: %s", e)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifespan context manager for startup and shutdown events."""
@@ -37,22 +51,37 @@ async def lifespan(app: FastAPI):
     settings = get_settings()
     
     # Validate configuration
-    if not settings.validate_llm_config():
+    if not settings.llm_config_valid:
         logger.error("Invalid LLM configuration. Please check your environment variables.")
         raise RuntimeError("Invalid LLM configuration")
-    
-    if not settings.validate_vector_store_config():
+
+    if not settings.vector_store_config_valid:
         logger.error("Invalid vector store configuration. Please check your environment variables.")
         raise RuntimeError("Invalid vector store configuration")
     
     # Initialize agent
     agent = AIAgent()
     logger.info("RAG AI Agent initialized successfully")
-    
+
+    # Health payload is immutable post-startup; build it once instead of
+    # re-validating a pydantic model on every probe
+    app.state.health_response = HealthResponse(
+        status="healthy",
+        version=settings.app_version,
+        llm_provider=settings.llm_provider,
+        vector_store=settings.vector_store
+    )
+
+    # Continuous background session cleanup
+    cleanup_task = asyncio.create_task(
+        _periodic_cleanup(agent, settings.session_cleanup_interval)
+    )
+
     yield
-    
+
     # Shutdown
     logger.info("Shutting down RAG AI Agent...")
+    cleanup_task.cancel()
     if agent:
         agent.cleanup_sessions()
 
@@ -62,13 +91,14 @@ settings = get_settings()
 app = FastAPI(
     title=settings.app_name,
     version=settings.app_version,
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=settings.get_allowed_origins_list(),
+    allow_origins=settings.allowed_origins_list,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
@@ -109,17 +139,12 @@ async def root():
 
 
 @app.get("/health", response_model=HealthResponse)
-async def health_check():
+async def health_check(request: Request):
     """
     Health check endpoint.
     Returns the status of the application and configuration.
     """
-    return HealthResponse(
-        status="healthy",
-        version=settings.app_version,
-        llm_provider=settings.llm_provider,
-        vector_store=settings.vector_store
-    )
+    return request.app.state.health_response
 
 
 @app.post("/ask", response_model=AskResponse)
@@ -137,9 +162,10 @@ async def ask_question(request: AskRequest):
         raise HTTPException(status_code=503, detail="Agent not initialized")
     
     try:
-        logger.info(f"Processing query: {request.query[:100]}...")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Processing query: %s...", request.query[:100])
         
-        result = agent.process_query(
+        result = await agent.process_query(
             query=request.query,
             session_id=request.session_id
         )
@@ -152,10 +178,30 @@ async def ask_question(request: AskRequest):
         )
     
     except Exception as e:
-        logger.error(f"Error processing request: {e}")
+        logger.error("Error processing request: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/ask/stream")
+async def ask_question_stream(request: AskRequest):
+    """
+    Streaming variant of /ask.
+
+    Returns newline-delimited JSON: {"delta": token} lines as the answer
+    is generated, followed by a final line with sources and session info.
+    """
+    if not agent:
+        raise HTTPException(status_code=503, detail="Agent not initialized")
+
+    return StreamingResponse(
+        agent.process_query_stream(
+            query=request.query,
+            session_id=request.session_id
+        ),
+        media_type="application/x-ndjson"
+    )
+
+
 @app.post("/cleanup-sessions")
 async def cleanup_sessions():
     """
@@ -169,7 +215,7 @@ async def cleanup_sessions():
         cleaned = agent.cleanup_sessions()
         return {"message": f"Cleaned up {cleaned} expired sessions"}
     except Exception as e:
-        logger.error(f"Error cleaning up sessions: {e}")
+        logger.error("Error cleaning up sessions: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -182,14 +228,20 @@ if os.path.exists("static"):
 @app.exception_handler(404)
 async def not_found_handler(request: Request, exc: HTTPException):
     """Custom 404 handler."""
-    return {"error": "Not found", "path": str(request.url)}
+    return ORJSONResponse(
+        {"error": "Not found", "path": str(request.url)},
+        status_code=404
+    )
 
 
 @app.exception_handler(500)
 async def internal_error_handler(request: Request, exc: Exception):
     """Custom 500 handler."""
-    logger.error(f"Internal error: {exc}")
-    return {"error": "Internal server error", "detail": str(exc)}
+    logger.error("Internal error: %s", exc)
+    return ORJSONResponse(
+        {"error": "Internal server error", "detail": str(exc)},
+        status_code=500
+    )
 
 
 if __name__ == "__main__":
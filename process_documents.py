@@ -5,7 +5,7 @@ Run this script after setting up your environment to prepare the RAG system.
 
 import os
 import logging
-from rag_engine import RAGEngine
+from rag_engine import get_rag_engine
 from config import get_settings
 
 # Configure logging
@@ -13,6 +13,8 @@ logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
+logging.logThreads = False
+logging.logProcesses = False
 logger = logging.getLogger(__name__)
 
 
@@ -23,20 +25,20 @@ def main():
     # Validate configuration
     settings = get_settings()
     
-    if not settings.validate_llm_config():
+    if not settings.llm_config_valid:
         logger.error("Invalid LLM configuration. Please check your .env file.")
         return
-    
-    if not settings.validate_vector_store_config():
+
+    if not settings.vector_store_config_valid:
         logger.error("Invalid vector store configuration. Please check your .env file.")
         return
     
     # Initialize RAG engine
     try:
-        rag_engine = RAGEngine()
+        rag_engine = get_rag_engine()
         logger.info("RAG engine initialized successfully")
     except Exception as e:
-        logger.error(f"Failed to initialize RAG engine: {e}")
+        logger.error("Failed to initialize RAG engine: %s", e)
         return
     
     # List of sample documents to process
@@ -52,25 +54,25 @@ def main():
     
     for doc_name in documents:
         if not os.path.exists(doc_name):
-            logger.warning(f"Document not found: {doc_name}")
+            logger.warning("Document not found: %s", doc_name)
             continue
         
         try:
-            logger.info(f"Processing {doc_name}...")
+            logger.info("Processing %s...", doc_name)
             chunk_count = rag_engine.process_document(doc_name)
             total_chunks += chunk_count
             processed_count += 1
-            logger.info(f"✓ {doc_name}: {chunk_count} chunks created")
+            logger.info("✓ %s: %d chunks created", doc_name, chunk_count)
         except Exception as e:
-            logger.error(f"✗ Error processing {doc_name}: {e}")
+            logger.error("✗ Error processing %s: %s", doc_name, e)
     
     # Summary
     logger.info("\n" + "="*50)
     logger.info("Document Processing Summary")
     logger.info("="*50)
-    logger.info(f"Documents processed: {processed_count}/{len(documents)}")
-    logger.info(f"Total chunks created: {total_chunks}")
-    logger.info(f"Vector store: {settings.vector_store}")
+    logger.info("Documents processed: %d/%d", processed_count, len(documents))
+    logger.info("Total chunks created: %d", total_chunks)
+    logger.info("Vector store: %s", settings.vector_store)
     logger.info("="*50)
     
     if processed_count > 0:
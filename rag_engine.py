@@ -3,13 +3,19 @@ RAG (Retrieval-Augmented Generation) engine for document processing and retrieva
 Handles document chunking, embedding, and context retrieval for the AI agent.
 """
 
+import hashlib
+import json
+import mmap
 import os
 import re
-from typing import List, Dict, Any, Optional
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from typing import List, Dict, Any, Iterator, Optional
 import logging
 
+import numpy as np
+
 # For document processing
-import markdown
 from pypdf import PdfReader
 
 from vector_stores import get_vector_store
@@ -17,6 +23,150 @@ from config import get_settings
 
 logger = logging.getLogger(__name__)
 
+# Compiled once at import: per-call re.sub/re.finditer with string
+# patterns would re-hit the regex cache on every document.
+# Collapses runs of blank lines into a single paragraph break
+_PARA_RE = re.compile(r'\n\s*\n')
+# Chunk break points: a paragraph break, or the space right after
+# sentence-ending punctuation (so the chunk keeps the punctuation)
+_BOUNDARY_RE = re.compile(r'\n\n|(?<=[.!?]) ')
+
+SUPPORTED_EXTS = frozenset({'.pdf', '.md', '.markdown', '.txt'})
+
+# Sidecar file (per documents dir) recording what has been ingested:
+# path -> [mtime, content digest, chunk count]
+_INGEST_CACHE_NAME = '.rag_cache.json'
+
+
+def _file_digest(file_path: str) -> str:
+    """Hash a file's bytes in 64 KB blocks (blake2b is the fastest
+    stdlib digest; the hash is negligible next to embedding cost)."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as f:
+        while block := f.read(65536):
+            h.update(block)
+    return h.hexdigest()
+
+
+# Extraction and chunking live at module level so worker processes can
+# pickle and run them without dragging the engine (and its vector store)
+# across the process boundary.
+
+def _extract_pdf_text(file_path: str) -> str:
+    """Extract text from a PDF file, decoding pages in parallel."""
+    try:
+        reader = PdfReader(file_path)
+        # Decode pages across threads (the compressed-stream parsing
+        # releases the GIL) and join once instead of quadratic +=
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            pages = list(executor.map(
+                lambda page: page.extract_text() or "", reader.pages
+            ))
+        return "\n".join(pages)
+    except Exception as e:
+        logger.error(f"Error extracting from PDF: {e}")
+        raise
+
+
+def _extract_plain_text(file_path: str) -> str:
+    """Extract text from a plain text (or markdown, kept as-is) file."""
+    try:
+        with open(file_path, 'rb') as f:
+            try:
+                # Decode straight out of the page cache: str() accepts the
+                # mmap's buffer directly, so the only allocation is the
+                # final string (no intermediate bytes copy as with read())
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    return str(mm, 'utf-8')
+            except ValueError:
+                # Empty files cannot be mapped
+                return ""
+    except Exception as e:
+        logger.error(f"Error extracting from text file: {e}")
+        raise
+
+
+def _extract_text(file_path: str) -> str:
+    """Extract text from a file based on its extension."""
+    file_ext = os.path.splitext(file_path)[1].lower()
+
+    if file_ext == '.pdf':
+        return _extract_pdf_text(file_path)
+    elif file_ext in ('.md', '.markdown', '.txt'):
+        return _extract_plain_text(file_path)
+    raise ValueError(f"Unsupported file type: {file_ext}")
+
+
+def _iter_text_chunks(
+    text: str,
+    chunk_size: int,
+    chunk_overlap: int
+) -> Iterator[str]:
+    """
+    Chunk text into smaller pieces with overlap, yielded lazily so the
+    full chunk list is never materialized alongside the document.
+    Uses a simple character-based chunking strategy.
+    """
+    # Clean up the text
+    text = _PARA_RE.sub('\n\n', text)  # Remove excessive newlines
+    text = text.strip()
+
+    if len(text) <= chunk_size:
+        yield text
+        return
+
+    # Collect every break point once in a single C-level regex pass,
+    # then binary-search per chunk instead of rescanning the window
+    # with repeated rfind calls
+    boundaries = np.fromiter(
+        (m.start() for m in _BOUNDARY_RE.finditer(text)),
+        dtype=np.int64
+    )
+
+    start = 0
+    text_len = len(text)
+
+    while start < text_len:
+        end = start + chunk_size
+
+        # If this is not the last chunk, break at the last sentence or
+        # paragraph boundary that fits
+        if end < text_len and boundaries.size:
+            idx = np.searchsorted(boundaries, end, side='right') - 1
+            if idx >= 0 and boundaries[idx] > start:
+                end = int(boundaries[idx])
+
+        chunk = text[start:end].strip()
+        if chunk:
+            yield chunk
+
+        # Move start position with overlap
+        start = end - chunk_overlap if end < text_len else end
+
+
+def _parse_and_chunk(
+    file_path: str,
+    source_name: str,
+    chunk_size: int,
+    chunk_overlap: int
+) -> List[Dict[str, Any]]:
+    """
+    Parse a file and return its chunk documents.
+    Top-level and picklable so it can run in a worker process.
+    """
+    text = _extract_text(file_path)
+    common = {'file_path': file_path}
+    return [
+        {
+            'content': chunk,
+            'source': source_name,
+            'metadata': {**common, 'chunk_index': i}
+        }
+        for i, chunk in enumerate(
+            _iter_text_chunks(text, chunk_size, chunk_overlap)
+        )
+    ]
+
 
 class RAGEngine:
     """RAG engine for document processing and retrieval."""
@@ -49,120 +199,40 @@ class RAGEngine:
             source_name = os.path.basename(file_path)
         
         # Extract text based on file type
-        file_ext = os.path.splitext(file_path)[1].lower()
-        
-        if file_ext == '.pdf':
-            text = self._extract_from_pdf(file_path)
-        elif file_ext in ['.md', '.markdown']:
-            text = self._extract_from_markdown(file_path)
-        elif file_ext == '.txt':
-            text = self._extract_from_text(file_path)
-        else:
-            raise ValueError(f"Unsupported file type: {file_ext}")
-        
-        # Chunk the text
-        chunks = self._chunk_text(text)
-        
-        # Create document objects
-        documents = [
-            {
+        text = _extract_text(file_path)
+
+        # Chunk lazily and flush to the vector store in mini-batches, so
+        # peak memory stays at one batch rather than the whole document
+        batch_size = self.settings.embedding_batch_size
+        batch = []
+        chunk_count = 0
+        # Shared common portion: every chunk's metadata references the
+        # same key/value objects instead of rebuilding them per chunk
+        common = {'file_path': file_path}
+
+        for i, chunk in enumerate(self._iter_chunks(text)):
+            batch.append({
                 'content': chunk,
                 'source': source_name,
-                'metadata': {
-                    'file_path': file_path,
-                    'chunk_index': i,
-                    'total_chunks': len(chunks)
-                }
-            }
-            for i, chunk in enumerate(chunks)
-        ]
-        
-        # Add to vector store
-        self.vector_store.add_documents(documents)
-        
-        logger.info(f"Processed {source_name}: {len(chunks)} chunks created")
-        return len(chunks)
-    
-    def _extract_from_pdf(self, file_path: str) -> str:
-        """Extract text from PDF file."""
-        try:
-            reader = PdfReader(file_path)
-            text = ""
-            for page in reader.pages:
-                text += page.extract_text() + "\n"
-            return text
-        except Exception as e:
-            logger.error(f"Error extracting from PDF: {e}")
-            raise
-    
-    def _extract_from_markdown(self, file_path: str) -> str:
-        """Extract text from Markdown file."""
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                md_content = f.read()
-            
-            # Convert markdown to plain text (remove formatting)
-            # For better results, we keep the markdown as-is
-            return md_content
-        except Exception as e:
-            logger.error(f"Error extracting from Markdown: {e}")
-            raise
-    
-    def _extract_from_text(self, file_path: str) -> str:
-        """Extract text from plain text file."""
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return f.read()
-        except Exception as e:
-            logger.error(f"Error extracting from text file: {e}")
-            raise
-    
-    def _chunk_text(self, text: str) -> List[str]:
-        """
-        Chunk text into smaller pieces with overlap.
-        Uses a simple character-based chunking strategy.
-        """
-        chunk_size = self.settings.chunk_size
-        chunk_overlap = self.settings.chunk_overlap
-        
-        # Clean up the text
-        text = re.sub(r'\n\s*\n', '\n\n', text)  # Remove excessive newlines
-        text = text.strip()
-        
-        if len(text) <= chunk_size:
-            return [text]
-        
-        chunks = []
-        start = 0
-        
-        while start < len(text):
-            end = start + chunk_size
-            
-            # If this is not the last chunk, try to break at a sentence or paragraph
-            if end < len(text):
-                # Look for paragraph break
-                paragraph_break = text.rfind('\n\n', start, end)
-                if paragraph_break != -1 and paragraph_break > start:
-                    end = paragraph_break
-                else:
-                    # Look for sentence break
-                    sentence_break = max(
-                        text.rfind('. ', start, end),
-                        text.rfind('! ', start, end),
-                        text.rfind('? ', start, end)
-                    )
-                    if sentence_break != -1 and sentence_break > start:
-                        end = sentence_break + 1
-            
-            chunk = text[start:end].strip()
-            if chunk:
-                chunks.append(chunk)
-            
-            # Move start position with overlap
-            start = end - chunk_overlap if end < len(text) else end
-        
-        return chunks
+                'metadata': {**common, 'chunk_index': i}
+            })
+            chunk_count += 1
+            if len(batch) >= batch_size:
+                self.vector_store.add_documents(batch)
+                batch = []
+
+        if batch:
+            self.vector_store.add_documents(batch)
+
+        logger.info("Processed %s: %d chunks created", source_name, chunk_count)
+        return chunk_count
     
+    def _iter_chunks(self, text: str) -> Iterator[str]:
+        """Chunk text lazily using the configured size and overlap."""
+        yield from _iter_text_chunks(
+            text, self.settings.chunk_size, self.settings.chunk_overlap
+        )
+
     def retrieve_context(
         self, 
         query: str, 
@@ -183,7 +253,41 @@ class RAGEngine:
         
         results = self.vector_store.search(query, top_k=top_k)
         
-        logger.info(f"Retrieved {len(results)} context chunks for query")
+        logger.info("Retrieved %d context chunks for query", len(results))
+        return results
+
+    def retrieve_context_batch(
+        self,
+        queries: List[str],
+        top_k: Optional[int] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Retrieve relevant context for several queries in one shot.
+
+        Batches the embedding forward pass and the index scan when the
+        vector store supports it, falling back to per-query retrieval
+        otherwise.
+
+        Args:
+            queries: The user queries
+            top_k: Chunks to retrieve per query (defaults to config value)
+
+        Returns:
+            One list of relevant chunks per query, in input order
+        """
+        if top_k is None:
+            top_k = self.settings.max_chunks_to_retrieve
+
+        search_batch = getattr(self.vector_store, 'search_batch', None)
+        if search_batch is not None:
+            results = search_batch(queries, top_k=top_k)
+        else:
+            results = [
+                self.vector_store.search(query, top_k=top_k)
+                for query in queries
+            ]
+
+        logger.info("Retrieved context for %d queries", len(queries))
         return results
     
     def format_context(self, chunks: List[Dict[str, Any]]) -> str:
@@ -198,17 +302,27 @@ class RAGEngine:
         """
         if not chunks:
             return ""
-        
+
+        # Deterministic ordering (by source, then chunk position) so the
+        # same retrieved set always renders to a byte-identical string --
+        # this is what makes provider-side prompt-prefix caching effective.
+        ordered = sorted(
+            chunks,
+            key=lambda c: (
+                c.get('source', ''),
+                c.get('metadata', {}).get('chunk_index', 0)
+            )
+        )
+
         context_parts = []
-        for i, chunk in enumerate(chunks, 1):
+        for i, chunk in enumerate(ordered, 1):
             source = chunk.get('source', 'Unknown')
             content = chunk.get('content', '')
-            score = chunk.get('score', 0)
-            
+
             context_parts.append(
-                f"[Source {i}: {source} (relevance: {score:.2f})]\n{content}\n"
+                f"[Source {i}: {source}]\n{content}\n"
             )
-        
+
         return "\n---\n".join(context_parts)
     
     def get_sources(self, chunks: List[Dict[str, Any]]) -> List[str]:
@@ -221,14 +335,84 @@ class RAGEngine:
         Returns:
             List of unique source names
         """
+        return sorted({
+            chunk['source']
+            for chunk in chunks
+            if chunk.get('source')
+        })
+
+    def format_context_with_sources(
+        self,
+        chunks: List[Dict[str, Any]]
+    ) -> tuple[str, List[str]]:
+        """
+        Format chunks into a context string and collect their unique
+        sources in one pass over the result set.
+
+        Args:
+            chunks: List of document chunks
+
+        Returns:
+            Tuple of (formatted context, sorted unique source names)
+        """
+        if not chunks:
+            return "", []
+
+        ordered = sorted(
+            chunks,
+            key=lambda c: (
+                c.get('source', ''),
+                c.get('metadata', {}).get('chunk_index', 0)
+            )
+        )
+
+        context_parts = []
         sources = set()
-        for chunk in chunks:
-            source = chunk.get('source', '')
-            if source:
-                sources.add(source)
-        
-        return sorted(list(sources))
+        for i, chunk in enumerate(ordered, 1):
+            source = chunk.get('source', 'Unknown')
+            content = chunk.get('content', '')
+
+            context_parts.append(f"[Source {i}: {source}]\n{content}\n")
+            if chunk.get('source'):
+                sources.add(chunk['source'])
+
+        return "\n---\n".join(context_parts), sorted(sources)
     
+    def total_tokens(self) -> int:
+        """
+        Estimate the token count of the full indexed corpus.
+        Uses the ~4 chars/token heuristic; good enough for budget checks.
+        """
+        store = getattr(self.vector_store, 'doc_store', None)
+        if not store or not len(store):
+            return 0
+
+        total_chars = sum(len(content) for content in store.contents)
+        return total_chars // 4
+
+    def dump_all_chunks_sorted(self) -> str:
+        """
+        Render the entire corpus as one deterministic context string
+        (sorted by source and chunk position) for CAG-style prompting.
+        """
+        store = getattr(self.vector_store, 'doc_store', None)
+        if not store or not len(store):
+            return ""
+
+        order = sorted(
+            range(len(store)),
+            key=lambda i: (
+                store.sources[i],
+                store.metadatas[i].get('chunk_index', 0)
+            )
+        )
+
+        parts = [
+            f"[Source: {store.sources[i] or 'Unknown'}]\n{store.contents[i]}\n"
+            for i in order
+        ]
+        return "\n---\n".join(parts)
+
     def process_all_documents(self, documents_dir: str = ".") -> Dict[str, int]:
         """
         Process all supported documents in a directory.
@@ -239,24 +423,97 @@ class RAGEngine:
         Returns:
             Dictionary mapping filenames to chunk counts
         """
-        supported_extensions = ['.pdf', '.md', '.markdown', '.txt']
         results = {}
-        
-        for filename in os.listdir(documents_dir):
-            file_path = os.path.join(documents_dir, filename)
-            
-            if not os.path.isfile(file_path):
-                continue
-            
-            file_ext = os.path.splitext(filename)[1].lower()
-            if file_ext not in supported_extensions:
-                continue
-            
+
+        # Ingestion cache: skip files whose mtime and content hash match
+        # the previous run, since re-embedding them is the dominant cost
+        cache_path = os.path.join(documents_dir, _INGEST_CACHE_NAME)
+        cache = {}
+        if os.path.exists(cache_path):
             try:
-                chunk_count = self.process_document(file_path, filename)
-                results[filename] = chunk_count
+                with open(cache_path, 'r', encoding='utf-8') as f:
+                    cache = json.load(f)
             except Exception as e:
-                logger.error(f"Error processing {filename}: {e}")
-                results[filename] = 0
-        
+                logger.warning(f"Error loading ingest cache: {e}")
+
+        # scandir serves is_file() from the dirent cache, avoiding the
+        # extra stat syscall per entry that listdir + isfile costs
+        paths = []
+        names = []
+        digests = {}
+        with os.scandir(documents_dir) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+
+                file_ext = os.path.splitext(entry.name)[1].lower()
+                if file_ext not in SUPPORTED_EXTS:
+                    continue
+
+                cached = cache.get(entry.path)
+                mtime = entry.stat().st_mtime
+                if cached is not None:
+                    if cached[0] == mtime:
+                        # Unchanged by mtime: skip without even hashing
+                        results[entry.name] = cached[2]
+                        continue
+                    digest = _file_digest(entry.path)
+                    if cached[1] == digest:
+                        # Touched but identical content: refresh the mtime
+                        cache[entry.path][0] = mtime
+                        results[entry.name] = cached[2]
+                        continue
+                    digests[entry.path] = (mtime, digest)
+
+                paths.append(entry.path)
+                names.append(entry.name)
+
+        if not paths:
+            return results
+
+        # Parse + chunk is CPU-bound Python, so fan the files out across
+        # worker processes; only the vector-store writes (not process-safe)
+        # stay in this process
+        chunk_size = self.settings.chunk_size
+        chunk_overlap = self.settings.chunk_overlap
+
+        with ProcessPoolExecutor() as executor:
+            futures = {
+                name: executor.submit(
+                    _parse_and_chunk, path, name, chunk_size, chunk_overlap
+                )
+                for path, name in zip(paths, names)
+            }
+            for (name, future), path in zip(futures.items(), paths):
+                try:
+                    documents = future.result()
+                    self.vector_store.add_documents(documents)
+                    results[name] = len(documents)
+                    logger.info(
+                        "Processed %s: %d chunks created", name, len(documents)
+                    )
+                    mtime, digest = digests.get(path) or (
+                        os.path.getmtime(path), _file_digest(path)
+                    )
+                    cache[path] = [mtime, digest, len(documents)]
+                except Exception as e:
+                    logger.error(f"Error processing {name}: {e}")
+                    results[name] = 0
+
+        try:
+            with open(cache_path, 'w', encoding='utf-8') as f:
+                json.dump(cache, f)
+        except Exception as e:
+            logger.warning(f"Error saving ingest cache: {e}")
+
         return results
+
+
+@lru_cache(maxsize=1)
+def get_rag_engine() -> RAGEngine:
+    """
+    Get the process-lifetime RAGEngine singleton.
+    Construction loads the embedding model and index, so it is amortized
+    across all callers instead of paid per instantiation.
+    """
+    return RAGEngine()
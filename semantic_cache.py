@@ -0,0 +1,140 @@
+"""
+Semantic response cache for the RAG AI Agent.
+Caches query responses keyed by embedding similarity, so paraphrased
+questions can reuse a prior answer without re-running retrieval + LLM.
+"""
+
+import threading
+import time
+from typing import Any, Dict, List, Optional
+import logging
+
+import faiss
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticCache:
+    """
+    In-memory semantic cache over normalized query embeddings.
+
+    Uses a small FAISS inner-product index so a lookup is a single
+    cosine-similarity search. Entries expire after a TTL and the cache
+    evicts least-recently-used entries once full.
+    """
+
+    def __init__(
+        self,
+        embedding_model,
+        threshold: float = 0.95,
+        ttl: int = 3600,
+        max_entries: int = 1024
+    ):
+        self.embedding_model = embedding_model
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        self.index: Optional[faiss.Index] = None
+        self.entries: List[Dict[str, Any]] = []
+        # get/store run on worker threads; eviction rebuilds the index
+        # while lookups search it, so both take this lock (the embedding
+        # itself happens outside it)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+        logger.info(
+            "Initialized semantic cache (threshold=%s, ttl=%ss, max_entries=%s)",
+            threshold, ttl, max_entries
+        )
+
+    def _embed(self, query: str) -> np.ndarray:
+        """Embed a query and normalize to unit length for cosine similarity."""
+        embedding = self.embedding_model.encode([query], convert_to_numpy=True)
+        embedding = embedding.astype('float32')
+        faiss.normalize_L2(embedding)
+        return embedding
+
+    def _rebuild_index(self) -> None:
+        """Rebuild the FAISS index from the current entries."""
+        if not self.entries:
+            self.index = None
+            return
+
+        dimension = self.entries[0]['embedding'].shape[1]
+        self.index = faiss.IndexFlatIP(dimension)
+        self.index.add(np.vstack([e['embedding'] for e in self.entries]))
+
+    def get(self, query: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached response for a semantically similar query.
+
+        Returns the stored response dict if the best match exceeds the
+        similarity threshold and has not expired, otherwise None.
+        """
+        if self.index is None or self.index.ntotal == 0:
+            self.misses += 1
+            return None
+
+        embedding = self._embed(query)
+
+        with self._lock:
+            if self.index is None or self.index.ntotal == 0:
+                self.misses += 1
+                return None
+
+            scores, indices = self.index.search(embedding, 1)
+
+            idx = int(indices[0][0])
+            score = float(scores[0][0])
+
+            if idx < 0 or idx >= len(self.entries) or score < self.threshold:
+                self.misses += 1
+                return None
+
+            entry = self.entries[idx]
+            if time.monotonic() - entry['stored_at'] > self.ttl:
+                # Expired: drop the entry and treat as a miss
+                self.entries.pop(idx)
+                self._rebuild_index()
+                self.misses += 1
+                return None
+
+            entry['last_used'] = time.monotonic()
+            self.hits += 1
+
+        logger.info("Semantic cache hit (similarity=%.3f)", score)
+        return entry['response']
+
+    def store(self, query: str, response: Dict[str, Any]) -> None:
+        """Store a response for a query, evicting the LRU entry if full."""
+        embedding = self._embed(query)
+
+        with self._lock:
+            if len(self.entries) >= self.max_entries:
+                lru_idx = min(
+                    range(len(self.entries)),
+                    key=lambda i: self.entries[i]['last_used']
+                )
+                self.entries.pop(lru_idx)
+                self._rebuild_index()
+
+            now = time.monotonic()
+            self.entries.append({
+                'embedding': embedding,
+                'response': response,
+                'stored_at': now,
+                'last_used': now
+            })
+
+            if self.index is None:
+                self._rebuild_index()
+            else:
+                self.index.add(embedding)
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters for logging."""
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.entries)}
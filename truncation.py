@@ -0,0 +1,92 @@
+"""
+Token-aware conversation truncation for the RAG AI Agent.
+Keeps the largest suffix of a conversation that fits a token budget,
+instead of counting messages (ten short turns and ten huge pastes are
+very different token loads).
+"""
+
+from typing import Callable, Dict, List
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Rough chars-per-token ratio used when no real tokenizer is available
+_CHARS_PER_TOKEN = 4
+
+# Don't bother keeping a partial message smaller than this
+_MIN_PARTIAL_TOKENS = 32
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap character-based token estimate (~4 chars/token)."""
+    return max(1, len(text) // _CHARS_PER_TOKEN)
+
+
+def _history_tokens(
+    messages: List[Dict[str, str]],
+    count_tokens: Callable[[str], int]
+) -> int:
+    """Total token estimate for a list of messages."""
+    return sum(count_tokens(msg.get('content', '')) for msg in messages)
+
+
+def truncate_history(
+    messages: List[Dict[str, str]],
+    max_tokens: int,
+    count_tokens: Callable[[str], int] = estimate_tokens
+) -> List[Dict[str, str]]:
+    """
+    Return the largest suffix of `messages` that fits under `max_tokens`.
+
+    Uses binary search on the suffix start index, then tries to salvage a
+    tail of the first dropped message, snapped to a sentence boundary so
+    the kept text never starts mid-sentence.
+
+    Args:
+        messages: Conversation messages ({'role': ..., 'content': ...})
+        max_tokens: Token budget for the returned history
+        count_tokens: Token counter; defaults to a char-based estimate
+
+    Returns:
+        A new list of messages fitting the budget (oldest first)
+    """
+    if not messages or max_tokens <= 0:
+        return []
+
+    if _history_tokens(messages, count_tokens) <= max_tokens:
+        return list(messages)
+
+    # Binary search the smallest start index whose suffix fits the budget
+    lo, hi = 0, len(messages)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if _history_tokens(messages[mid:], count_tokens) <= max_tokens:
+            hi = mid
+        else:
+            lo = mid + 1
+
+    kept = [dict(msg) for msg in messages[lo:]]
+
+    # Salvage the tail of the first dropped message if budget remains
+    if lo > 0:
+        remaining = max_tokens - _history_tokens(kept, count_tokens)
+        if remaining >= _MIN_PARTIAL_TOKENS:
+            dropped = messages[lo - 1]
+            content = dropped.get('content', '')
+            cut = len(content) - remaining * _CHARS_PER_TOKEN
+
+            if 0 < cut < len(content):
+                # Snap to the next sentence/paragraph boundary
+                boundary = max(content.find('. ', cut), content.find('\n', cut))
+                if boundary != -1:
+                    cut = boundary + 1
+
+                partial = dict(dropped)
+                partial['content'] = content[cut:].lstrip()
+                if partial['content']:
+                    kept.insert(0, partial)
+
+    logger.info(
+        "Truncated history from %d to %d messages", len(messages), len(kept)
+    )
+    return kept
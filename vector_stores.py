@@ -4,14 +4,23 @@ Default is FAISS (local, free), with commented code for cloud alternatives.
 """
 
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import lru_cache
 from typing import List, Dict, Any, Optional
+import atexit
+import hashlib
+import orjson
 import os
 import pickle
+import threading
+import time
 import logging
 
 # FAISS (Default - Local)
 import faiss
 import numpy as np
+import torch
 
 # Pinecone (Uncomment to use)
 # import pinecone
@@ -27,6 +36,145 @@ from config import get_settings
 
 logger = logging.getLogger(__name__)
 
+# Below this corpus size exhaustive search is already fast and IVFPQ
+# training would be starved for data, so the flat/SQ index is kept
+_IVFPQ_MIN_VECTORS = 10_000
+# Probes per IVFPQ query: 8 of nlist cells balances recall vs. scan cost
+_IVFPQ_NPROBE = 8
+
+# Debounce for full index/metadata checkpoints: snapshot at most every
+# few seconds or every so many appended docs, whichever comes first;
+# between checkpoints new docs land only in the JSONL log
+_CHECKPOINT_INTERVAL_S = 5.0
+_CHECKPOINT_DOCS = 1000
+
+# Cap on the content-hash -> embedding cache (oldest entries evicted);
+# ~75 MB at 384-dim float32
+_EMB_CACHE_MAX_ENTRIES = 50_000
+
+# Minimum vectors before training the int8 scalar quantizer: training
+# per-dimension ranges on a tiny first batch collapses every stored
+# vector to the same quantized point
+_SQ_TRAIN_MIN = 256
+
+
+class _MmapTextColumn:
+    """
+    Read-only string column backed by a memory-mapped UTF-8 blob.
+
+    Rows are decoded on access, so load time and resident memory stay
+    constant regardless of corpus size — only retrieved rows page in.
+    Mutation is copy-on-write via materialize().
+    """
+
+    def __init__(self, blob_path: str, offsets_path: str):
+        self._blob = np.load(blob_path, mmap_mode='r')
+        self._offsets = np.load(offsets_path)
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, row: int) -> str:
+        start, end = self._offsets[row], self._offsets[row + 1]
+        return bytes(self._blob[start:end]).decode('utf-8')
+
+    def materialize(self) -> List[str]:
+        """Decode every row into a plain in-memory list."""
+        return [self[row] for row in range(len(self))]
+
+
+@dataclass
+class DocStore:
+    """
+    Column-oriented document storage (struct-of-arrays).
+
+    Keeping contents, sources and metadata in parallel lists instead of
+    one list of dicts shrinks the pickle, loads faster, and lets result
+    dicts be built only for the handful of hits actually returned.
+    """
+
+    contents: List[str] = field(default_factory=list)
+    sources: List[str] = field(default_factory=list)
+    metadatas: List[Dict[str, Any]] = field(default_factory=list)
+    # Stable int64 ID per row, matching the IDs stored in the FAISS index
+    ids: List[int] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.contents)
+
+    def extend(
+        self,
+        documents: List[Dict[str, Any]],
+        ids: Optional[List[int]] = None
+    ) -> None:
+        """Append document dicts, splitting them into the columns."""
+        if not isinstance(self.contents, list):
+            # Copy-on-write: appending to a memory-mapped column first
+            # turns it back into a plain list
+            self.contents = self.contents.materialize()
+        if ids is None:
+            start = (max(self.ids) + 1) if self.ids else 0
+            ids = range(start, start + len(documents))
+        for doc, doc_id in zip(documents, ids):
+            self.contents.append(doc.get('content', ''))
+            self.sources.append(doc.get('source', ''))
+            self.metadatas.append(doc.get('metadata', {}))
+            self.ids.append(int(doc_id))
+
+    def hit(self, idx: int, score: float) -> Dict[str, Any]:
+        """Assemble a search-result dict for one row."""
+        return {
+            'content': self.contents[idx],
+            'source': self.sources[idx],
+            'metadata': self.metadatas[idx],
+            'score': score
+        }
+
+
+class OnnxEmbedder:
+    """
+    Drop-in replacement for SentenceTransformer.encode backed by ONNX
+    Runtime, which fuses attention/LayerNorm kernels for a 2-4x faster
+    CPU forward pass. Requires the optional optimum[onnxruntime] extra;
+    construction raises ImportError when it is missing.
+    """
+
+    def __init__(self, model_id: str = 'sentence-transformers/all-MiniLM-L6-v2'):
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        from transformers import AutoTokenizer
+
+        self.model = ORTModelForFeatureExtraction.from_pretrained(
+            model_id, export=True
+        )
+        self.tokenizer = AutoTokenizer.from_pretrained(model_id)
+
+    def encode(
+        self,
+        sentences: List[str],
+        batch_size: int = 32,
+        convert_to_numpy: bool = True,
+        normalize_embeddings: bool = False,
+        show_progress_bar: bool = False
+    ) -> np.ndarray:
+        """Embed sentences with mean pooling, mirroring ST semantics."""
+        groups = []
+        for i in range(0, len(sentences), batch_size):
+            batch = sentences[i:i + batch_size]
+            inputs = self.tokenizer(
+                batch, padding=True, truncation=True, return_tensors='np'
+            )
+            hidden = np.asarray(self.model(**inputs).last_hidden_state)
+            mask = inputs['attention_mask'][..., None].astype(hidden.dtype)
+            pooled = (hidden * mask).sum(axis=1) / np.maximum(
+                mask.sum(axis=1), 1e-9
+            )
+            groups.append(pooled)
+
+        embeddings = np.ascontiguousarray(np.vstack(groups), dtype=np.float32)
+        if normalize_embeddings:
+            faiss.normalize_L2(embeddings)
+        return embeddings
+
 
 class BaseVectorStore(ABC):
     """Base class for vector stores."""
@@ -60,63 +208,427 @@ class FAISSVectorStore(BaseVectorStore):
     def __init__(self):
         settings = get_settings()
         self.index_path = settings.faiss_index_path
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+        self.quantization = settings.embedding_quantization
+        # Size the torch and FAISS CPU pools explicitly: containers often
+        # default to a single thread, leaving ALUs idle during encode and
+        # search. One core is left for the event loop — asyncio at the
+        # web layer should not over-subscribe on top of this.
+        threads = settings.compute_threads or max(1, (os.cpu_count() or 4) - 1)
+        torch.set_num_threads(threads)
+        if hasattr(faiss, 'omp_set_num_threads'):
+            faiss.omp_set_num_threads(threads)
+        # Encode on GPU when one is present (order-of-magnitude faster
+        # transformer throughput); CPU otherwise
+        device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        self.embedding_model = None
+        if settings.use_onnx_embedder:
+            try:
+                self.embedding_model = OnnxEmbedder()
+                logger.info("Using ONNX Runtime embedder")
+            except Exception as e:
+                logger.warning(
+                    f"ONNX embedder unavailable ({e}); using PyTorch"
+                )
+        if self.embedding_model is None:
+            self.embedding_model = SentenceTransformer(
+                'all-MiniLM-L6-v2', device=device
+            )
+            # Compile the transformer to strip per-op Python dispatch and
+            # fuse kernels — single-query encodes dominate search latency
+            # and benefit most. dynamic=True keeps one graph across the
+            # ever-varying padded sequence lengths; a static shape would
+            # recompile (seconds of stall) on each new length until dynamo
+            # silently gave up. Older torch builds fall back to eager.
+            try:
+                module = self.embedding_model._first_module()
+                module.auto_model = torch.compile(
+                    module.auto_model, mode="reduce-overhead", dynamic=True
+                )
+                # Pay the one-off compile cost here, not on the first query
+                self.embedding_model.encode(["warmup"])
+                logger.info("Compiled embedding model with torch.compile")
+            except Exception as e:
+                logger.warning(f"torch.compile unavailable ({e}); using eager mode")
         self.dimension = 384  # Dimension for all-MiniLM-L6-v2
-        
+        # GPU index needs a CUDA device and the faiss-gpu build
+        self._gpu_enabled = (
+            device == 'cuda' and hasattr(faiss, 'StandardGpuResources')
+        )
+        if self._gpu_enabled:
+            self._gpu_res = faiss.StandardGpuResources()
+
         # Create directory if it doesn't exist
         os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
-        
+
         # Load or create index
-        self.index = self._load_or_create_index()
-        self.documents = self._load_documents()
-        
+        self.index = self._to_device(self._load_or_create_index())
+        self.doc_store, replayed = self._load_documents()
+        # Stable-ID bookkeeping: FAISS returns IDs, results need rows
+        self._row_of = {
+            doc_id: row for row, doc_id in enumerate(self.doc_store.ids)
+        }
+        self._next_id = (
+            max(self.doc_store.ids) + 1 if self.doc_store.ids else 0
+        )
+        # Content-hash -> embedding cache so repeated ingests of the same
+        # text skip the transformer forward pass entirely
+        self.emb_cache = self._load_emb_cache()
+        # Repeated queries skip the forward pass too; bytes are cached
+        # because they are immutable and hashable
+        self._embed_query_cached = lru_cache(maxsize=1024)(self._embed_query)
+
+        # Append-only persistence: each add lands in the JSONL log in
+        # O(batch) I/O; the full index/pickle rewrite happens only on
+        # periodic checkpoints and at exit
+        self._docs_log_path = f"{self.index_path}.docs.jsonl"
+        self._dirty = False
+        self._docs_since_checkpoint = 0
+        self._last_checkpoint_ts = time.monotonic()
+        # Holds (embeddings, ids) batches while an untrained quantizer
+        # waits for a representative training sample
+        self._train_buffer: List[tuple] = []
+        # Guards index/doc_store/log mutations against the background
+        # checkpoint thread, which captures its snapshot under this lock
+        self._state_lock = threading.Lock()
+        # Checkpoints run on a single background thread so ingestion can
+        # keep encoding while the previous snapshot is still writing;
+        # disk I/O releases the GIL
+        self._io_pool = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='faiss-io'
+        )
+        self._save_future = None
+        atexit.register(self.flush)
+
+        # After an unclean shutdown the index checkpoint is missing the
+        # vectors for docs that only made it into the append log; rebuild
+        # them so the replayed docs are actually searchable
+        missing = len(self.doc_store) - self.index.ntotal
+        if replayed and missing > 0:
+            self._restore_replayed_vectors(replayed[-missing:])
+
         logger.info(f"Initialized FAISS vector store at {self.index_path}")
     
+    def _to_device(self, index: faiss.Index) -> faiss.Index:
+        """Move an index to the GPU when GPU search is enabled."""
+        if self._gpu_enabled:
+            return faiss.index_cpu_to_gpu(self._gpu_res, 0, index)
+        return index
+
+    def _new_index(self) -> faiss.Index:
+        """Create an empty index honoring the configured quantization."""
+        if self.quantization == "int8":
+            # int8 scalar quantization: 4x smaller vectors and SIMD int8
+            # distance kernels, at negligible recall loss for small top-k.
+            # Trained once _SQ_TRAIN_MIN vectors have accumulated.
+            inner = faiss.IndexScalarQuantizer(
+                self.dimension,
+                faiss.ScalarQuantizer.QT_8bit,
+                faiss.METRIC_INNER_PRODUCT
+            )
+        elif self.quantization == "fp16":
+            # fp16 halves memory and disk versus fp32 at negligible
+            # recall loss for MiniLM cosine search, and needs no training
+            inner = faiss.IndexScalarQuantizer(
+                self.dimension,
+                faiss.ScalarQuantizer.QT_fp16,
+                faiss.METRIC_INNER_PRODUCT
+            )
+        else:
+            inner = faiss.IndexFlatIP(self.dimension)
+        # Stable int64 IDs make single-document deletes an O(changed)
+        # remove_ids call instead of a full rebuild
+        return faiss.IndexIDMap2(inner)
+
+    def _supports_ids(self) -> bool:
+        """Whether the current index accepts explicit IDs on add."""
+        return hasattr(self.index, 'id_map') or hasattr(self.index, 'nprobe')
+
+    def _index_add(self, embeddings: np.ndarray, ids: np.ndarray) -> None:
+        """Add vectors under their IDs (positional for legacy indexes)."""
+        if self._supports_ids():
+            self.index.add_with_ids(embeddings, ids)
+        else:
+            self.index.add(embeddings)
+
+    def _add_or_buffer(self, embeddings: np.ndarray, ids: np.ndarray) -> None:
+        """
+        Add vectors to the index, buffering while an untrained quantizer
+        is still waiting for a representative training sample.
+        """
+        if self.index.is_trained:
+            self._index_add(embeddings, ids)
+            return
+        self._train_buffer.append((embeddings, ids))
+        self._drain_train_buffer()
+
+    def _drain_train_buffer(self, force: bool = False) -> None:
+        """
+        Train the quantizer and flush the buffered vectors once enough
+        have accumulated. A single small batch would train the int8
+        per-dimension ranges on near-zero-width data, after which every
+        stored vector quantizes to the same point; with force=True
+        (checkpoint/flush time) an undersized corpus falls back to the
+        training-free fp16 quantizer instead.
+        """
+        if not self._train_buffer:
+            return
+
+        total = sum(len(vectors) for vectors, _ in self._train_buffer)
+        if total < _SQ_TRAIN_MIN:
+            if not force:
+                return
+            logger.info(
+                "Only %d vectors available for int8 training; "
+                "storing as fp16 instead", total
+            )
+            inner = faiss.IndexScalarQuantizer(
+                self.dimension,
+                faiss.ScalarQuantizer.QT_fp16,
+                faiss.METRIC_INNER_PRODUCT
+            )
+            self.index = self._to_device(faiss.IndexIDMap2(inner))
+
+        vectors = np.vstack([v for v, _ in self._train_buffer])
+        if not self.index.is_trained:
+            self.index.train(vectors)
+        for batch, ids in self._train_buffer:
+            self._index_add(batch, ids)
+        self._train_buffer = []
+
     def _load_or_create_index(self) -> faiss.Index:
         """Load existing FAISS index or create a new one."""
         index_file = f"{self.index_path}.index"
-        
+
         if os.path.exists(index_file):
             try:
                 index = faiss.read_index(index_file)
+                if hasattr(index, 'nprobe'):
+                    index.nprobe = _IVFPQ_NPROBE
                 logger.info(f"Loaded existing FAISS index with {index.ntotal} vectors")
                 return index
             except Exception as e:
                 logger.warning(f"Error loading index: {e}. Creating new index.")
-        
-        # Create new index using L2 distance
-        index = faiss.IndexFlatL2(self.dimension)
-        logger.info("Created new FAISS index")
+
+        index = self._new_index()
+        logger.info(f"Created new FAISS index ({self.quantization})")
         return index
+
+    def _maybe_upgrade_index(self) -> None:
+        """
+        Swap the exhaustive index for IVFPQ once the corpus is large.
+
+        Brute-force scans are O(N) per query with full-width vectors;
+        IVFPQ visits only nprobe of nlist cells and stores 32-byte codes,
+        cutting per-query memory traffic by orders of magnitude. Existing
+        vectors are reconstructed from the old index to train and fill
+        the new one.
+        """
+        n = self.index.ntotal
+        if n < _IVFPQ_MIN_VECTORS or hasattr(self.index, 'nprobe'):
+            return
+
+        # Reconstruct by stable ID so the vector/ID pairing survives the
+        # swap (IndexIDMap2 keeps full vectors for exactly this purpose)
+        ids = np.asarray(self.doc_store.ids, dtype='int64')
+        vectors = np.vstack(
+            [self.index.reconstruct(int(doc_id)) for doc_id in ids]
+        )
+        nlist = max(64, int(n ** 0.5))
+        index = faiss.index_factory(
+            self.dimension, f"IVF{nlist},PQ32x8", faiss.METRIC_INNER_PRODUCT
+        )
+        index.train(vectors)
+        index.add_with_ids(vectors, ids)
+        index.nprobe = _IVFPQ_NPROBE
+        self.index = self._to_device(index)
+        logger.info(
+            "Upgraded FAISS index to IVF%d,PQ32x8 at %d vectors", nlist, n
+        )
     
-    def _load_documents(self) -> List[Dict[str, Any]]:
-        """Load document metadata."""
+    def _load_documents(self) -> tuple:
+        """
+        Load document metadata.
+
+        Returns the store plus the (id, content) pairs replayed from the
+        append log, so __init__ can rebuild their index vectors — the
+        log persists metadata only, and after an unclean shutdown the
+        index checkpoint predates those docs.
+        """
         docs_file = f"{self.index_path}.docs"
-        
+        replayed_pairs: List[tuple] = []
+
         if os.path.exists(docs_file):
             try:
                 with open(docs_file, 'rb') as f:
-                    documents = pickle.load(f)
-                logger.info(f"Loaded {len(documents)} document metadata entries")
-                return documents
+                    raw = f.read()
+                # JSON snapshots start with '{'; anything else is a
+                # legacy pickle (which always starts with \x80)
+                if raw[:1] == b'{':
+                    payload = orjson.loads(raw)
+                else:
+                    payload = pickle.loads(raw)
+                if isinstance(payload, dict) and payload.get('columnar'):
+                    # Columnar snapshot: contents stay on disk and are
+                    # decoded per retrieved row via mmap
+                    store = DocStore(
+                        contents=_MmapTextColumn(
+                            f"{self.index_path}.contents.npy",
+                            f"{self.index_path}.offsets.npy"
+                        ),
+                        sources=payload['sources'],
+                        metadatas=payload['metadatas'],
+                        ids=payload['ids']
+                    )
+                elif isinstance(payload, DocStore):
+                    store = payload
+                else:
+                    # Legacy list-of-dicts pickle: convert on load
+                    store = DocStore()
+                    store.extend(payload)
+                # Snapshots from before stable IDs: rows are the IDs
+                if not getattr(store, 'ids', None):
+                    store.ids = list(range(len(store)))
+                logger.info(f"Loaded {len(store)} document metadata entries")
             except Exception as e:
                 logger.warning(f"Error loading documents: {e}")
-        
-        return []
-    
-    def _save_index(self) -> None:
-        """Save FAISS index to disk."""
+                store = DocStore()
+        else:
+            store = DocStore()
+
+        # Replay docs appended to the log since the last checkpoint
+        log_file = f"{self.index_path}.docs.jsonl"
+        if os.path.exists(log_file):
+            try:
+                with open(log_file, 'rb') as f:
+                    replayed = [
+                        orjson.loads(line) for line in f if line.strip()
+                    ]
+                if replayed:
+                    # Log records carry their assigned ID; older logs
+                    # without one fall back to sequential assignment
+                    ids = [rec.pop('id', None) for rec in replayed]
+                    if any(doc_id is None for doc_id in ids):
+                        start = (max(store.ids) + 1) if store.ids else 0
+                        ids = list(range(start, start + len(replayed)))
+                    store.extend(replayed, ids)
+                    replayed_pairs = [
+                        (doc_id, rec.get('content', ''))
+                        for doc_id, rec in zip(ids, replayed)
+                    ]
+                    logger.info(
+                        "Replayed %d documents from append log", len(replayed)
+                    )
+            except Exception as e:
+                logger.warning(f"Error replaying docs log: {e}")
+
+        return store, replayed_pairs
+
+    def _restore_replayed_vectors(self, pairs: List[tuple]) -> None:
+        """
+        Re-embed and re-add vectors for docs replayed from the append log.
+
+        Mostly free when the persistent embedding cache survived the
+        crash; otherwise the contents are re-encoded. The restored
+        vectors keep their original IDs and the store is marked dirty so
+        the next checkpoint persists them into the index file.
+        """
+        texts = [content for _, content in pairs]
+        keys = [hashlib.sha256(text.encode()).hexdigest() for text in texts]
+        miss_idx = [
+            i for i, key in enumerate(keys) if key not in self.emb_cache
+        ]
+        if miss_idx:
+            vectors = self.embedding_model.encode(
+                [texts[i] for i in miss_idx],
+                batch_size=64,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                show_progress_bar=False
+            )
+            for i, vector in zip(miss_idx, vectors):
+                self.emb_cache[keys[i]] = vector
+
+        embeddings = np.ascontiguousarray(
+            np.vstack([self.emb_cache[key] for key in keys]),
+            dtype=np.float32
+        )
+        ids = np.asarray([doc_id for doc_id, _ in pairs], dtype='int64')
+        self._add_or_buffer(embeddings, ids)
+        self._dirty = True
+        logger.info("Restored %d vectors from append-log replay", len(pairs))
+
+    def _embed_query(self, query: str) -> bytes:
+        """Embed a query to normalized float32 bytes (LRU-cacheable)."""
+        embedding = self.embedding_model.encode(
+            [query], convert_to_numpy=True, normalize_embeddings=True
+        )
+        return np.ascontiguousarray(embedding, dtype=np.float32).tobytes()
+
+    def _load_emb_cache(self) -> Dict[str, np.ndarray]:
+        """Load the persistent content-hash -> embedding cache."""
+        cache_file = f"{self.index_path}.embcache"
+
+        if os.path.exists(cache_file):
+            try:
+                with open(cache_file, 'rb') as f:
+                    cache = pickle.load(f)
+                logger.info("Loaded %d cached embeddings", len(cache))
+                return cache
+            except Exception as e:
+                logger.warning(f"Error loading embedding cache: {e}")
+
+        return {}
+
+    def _save_emb_cache(self, cache: Dict[str, np.ndarray]) -> None:
+        """Persist an embedding-cache snapshot atomically (write-then-rename)."""
+        cache_file = f"{self.index_path}.embcache"
+        try:
+            tmp_file = f"{cache_file}.tmp"
+            with open(tmp_file, 'wb') as f:
+                pickle.dump(cache, f)
+            os.replace(tmp_file, cache_file)
+        except Exception as e:
+            logger.error(f"Error saving embedding cache: {e}")
+
+    def _save_index(self, index: faiss.Index) -> None:
+        """Save a (snapshot of the) FAISS index to disk."""
         try:
-            faiss.write_index(self.index, f"{self.index_path}.index")
+            faiss.write_index(index, f"{self.index_path}.index")
             logger.info("Saved FAISS index")
         except Exception as e:
             logger.error(f"Error saving index: {e}")
     
-    def _save_documents(self) -> None:
-        """Save document metadata to disk."""
+    def _save_documents(self, store: DocStore) -> None:
+        """
+        Save a (snapshot of the) document metadata store to disk.
+
+        Contents go into a UTF-8 blob plus an int64 offsets array so the
+        next startup can memory-map them instead of unpickling the whole
+        corpus; the small columns stay in the pickle.
+        """
         try:
+            contents = (
+                store.contents if isinstance(store.contents, list)
+                else store.contents.materialize()
+            )
+            encoded = [text.encode('utf-8') for text in contents]
+            offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+            if encoded:
+                np.cumsum([len(chunk) for chunk in encoded], out=offsets[1:])
+            blob = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+            np.save(f"{self.index_path}.contents.npy", blob)
+            np.save(f"{self.index_path}.offsets.npy", offsets)
+            payload = {
+                'columnar': True,
+                'sources': store.sources,
+                'metadatas': store.metadatas,
+                'ids': store.ids
+            }
+            # orjson: native-C serializer, several times faster than
+            # pickle for these plain dict/str columns, and no arbitrary
+            # code execution on load from an untrusted index dir
             with open(f"{self.index_path}.docs", 'wb') as f:
-                pickle.dump(self.documents, f)
+                f.write(orjson.dumps(payload))
             logger.info("Saved document metadata")
         except Exception as e:
             logger.error(f"Error saving documents: {e}")
@@ -131,21 +643,89 @@ class FAISSVectorStore(BaseVectorStore):
         
         # Extract text content for embedding
         texts = [doc.get('content', '') for doc in documents]
-        
-        # Generate embeddings
-        embeddings = self.embedding_model.encode(texts, convert_to_numpy=True)
-        
-        # Add to FAISS index
-        self.index.add(embeddings.astype('float32'))
-        
-        # Store document metadata
-        self.documents.extend(documents)
-        
-        # Save to disk
-        self._save_index()
-        self._save_documents()
-        
-        logger.info(f"Added {len(documents)} documents to FAISS index")
+
+        # Only texts missing from the persistent embedding cache pay for
+        # a transformer forward pass; repeats are served from disk
+        keys = [
+            hashlib.sha256(text.encode()).hexdigest() for text in texts
+        ]
+        miss_idx = [
+            i for i, key in enumerate(keys) if key not in self.emb_cache
+        ]
+
+        if miss_idx:
+            miss_texts = [texts[i] for i in miss_idx]
+            # An explicit batch_size lets the model sort by length
+            # internally so mini-batches carry minimal padding, and
+            # normalize_embeddings gives the unit vectors the
+            # inner-product index expects. Very large ingests are encoded
+            # in groups so peak memory stays bounded.
+            embedded_groups = [
+                self.embedding_model.encode(
+                    miss_texts[i:i + 4096],
+                    batch_size=64,
+                    convert_to_numpy=True,
+                    normalize_embeddings=True,
+                    show_progress_bar=False
+                )
+                for i in range(0, len(miss_texts), 4096)
+            ]
+            # No-op when encode already returned contiguous float32 (the
+            # usual case); .astype would copy the whole matrix every time
+            new_embeddings = np.ascontiguousarray(
+                embedded_groups[0] if len(embedded_groups) == 1
+                else np.vstack(embedded_groups),
+                dtype=np.float32
+            )
+            for i, vector in zip(miss_idx, new_embeddings):
+                self.emb_cache[keys[i]] = vector
+
+        # Assemble the full matrix in original order from the cache,
+        # then bound the cache (insertion order doubles as age)
+        embeddings = np.vstack([self.emb_cache[key] for key in keys])
+        while len(self.emb_cache) > _EMB_CACHE_MAX_ENTRIES:
+            self.emb_cache.pop(next(iter(self.emb_cache)))
+
+        with self._state_lock:
+            # Add to FAISS index under freshly assigned stable IDs. Legacy
+            # indexes loaded from disk without an ID map fall back to
+            # positional add, where row == ID anyway. While an int8
+            # quantizer is still untrained the vectors are buffered until
+            # a representative training sample exists.
+            ids = np.arange(
+                self._next_id, self._next_id + len(documents), dtype='int64'
+            )
+            self._add_or_buffer(embeddings, ids)
+
+            # Store document metadata
+            row = len(self.doc_store)
+            self.doc_store.extend(documents, ids.tolist())
+            for doc_id in ids.tolist():
+                self._row_of[doc_id] = row
+                row += 1
+            self._next_id += len(documents)
+
+            # Move to a cell-probe index once brute force stops being cheap
+            self._maybe_upgrade_index()
+
+            # Append the new docs to the log (O(batch) I/O); the full
+            # index/metadata rewrite waits for the next checkpoint
+            try:
+                with open(self._docs_log_path, 'ab') as f:
+                    for doc, doc_id in zip(documents, ids.tolist()):
+                        f.write(orjson.dumps({'id': doc_id, **doc}) + b'\n')
+            except Exception as e:
+                logger.error(f"Error appending to docs log: {e}")
+
+            self._dirty = True
+            self._docs_since_checkpoint += len(documents)
+        if (
+            self._docs_since_checkpoint >= _CHECKPOINT_DOCS
+            or time.monotonic() - self._last_checkpoint_ts > _CHECKPOINT_INTERVAL_S
+        ):
+            self._checkpoint_async()
+
+        logger.info("Added %d documents to FAISS index", len(documents))
     
     def search(
         self, 
@@ -153,34 +733,189 @@ class FAISSVectorStore(BaseVectorStore):
         top_k: int = 5
     ) -> List[Dict[str, Any]]:
         """Search for similar documents using FAISS."""
+        return self.search_batch([query], top_k=top_k)[0]
+
+    def search_batch(
+        self,
+        queries: List[str],
+        top_k: int = 5
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Search for similar documents for several queries at once.
+
+        All queries are embedded in one encode call and searched with a
+        single FAISS call over the (batch, dim) matrix, amortizing the
+        model forward pass and index scan across the batch.
+        """
+        if not queries:
+            return []
+
         if self.index.ntotal == 0:
             logger.warning("Index is empty, no results to return")
-            return []
-        
-        # Generate query embedding
-        query_embedding = self.embedding_model.encode([query], convert_to_numpy=True)
-        
-        # Search
+            return [[] for _ in queries]
+
+        if len(queries) == 1:
+            # Single-query batches go through the LRU embedding cache
+            query_embeddings = np.frombuffer(
+                self._embed_query_cached(queries[0]), dtype=np.float32
+            ).reshape(1, -1)
+        else:
+            query_embeddings = np.ascontiguousarray(
+                self.embedding_model.encode(
+                    queries,
+                    batch_size=32,
+                    convert_to_numpy=True,
+                    normalize_embeddings=True
+                ),
+                dtype=np.float32
+            )
+
         top_k = min(top_k, self.index.ntotal)
-        distances, indices = self.index.search(query_embedding.astype('float32'), top_k)
-        
-        # Retrieve documents
-        results = []
-        for idx, distance in zip(indices[0], distances[0]):
-            if idx < len(self.documents):
-                doc = self.documents[idx].copy()
-                doc['score'] = float(1 / (1 + distance))  # Convert distance to similarity score
-                results.append(doc)
-        
-        logger.info(f"Found {len(results)} results for query")
-        return results
-    
+        distances, indices = self.index.search(query_embeddings, top_k)
+
+        # One C-level tolist() per matrix hands the assembly loop native
+        # ints/floats instead of boxing a numpy scalar per element, which
+        # dominates the loop cost at large batch * top_k
+        batch_results = []
+        row_of = self._row_of
+        for row_indices, row_distances in zip(
+            indices.tolist(), distances.tolist()
+        ):
+            results = []
+            for doc_id, distance in zip(row_indices, row_distances):
+                # FAISS returns stable IDs; map them back to rows
+                row = row_of.get(doc_id)
+                if row is not None:
+                    # Inner product over unit vectors is cosine similarity
+                    results.append(self.doc_store.hit(row, distance))
+            batch_results.append(results)
+
+        logger.info("Ran batched search for %d queries", len(queries))
+        return batch_results
+
+    def _write_snapshot(self) -> None:
+        """
+        Write the index/metadata checkpoint and drop the covered prefix
+        of the append log.
+
+        A consistent copy of the index and the metadata columns is
+        captured under the state lock, then written without blocking
+        concurrent adds; only log bytes that existed at capture time are
+        truncated, so docs appended mid-write keep their durable copy.
+        """
+        with self._state_lock:
+            # An undersized training buffer is resolved (fp16 fallback)
+            # before the snapshot so no vectors are left unsearchable
+            self._drain_train_buffer(force=True)
+            self._dirty = False
+            self._docs_since_checkpoint = 0
+            self._last_checkpoint_ts = time.monotonic()
+            index = (
+                faiss.index_gpu_to_cpu(self.index) if self._gpu_enabled
+                else faiss.clone_index(self.index)
+            )
+            store = self.doc_store
+            contents = (
+                store.contents if isinstance(store.contents, list)
+                else store.contents.materialize()
+            )
+            snapshot = DocStore(
+                contents=list(contents),
+                sources=list(store.sources),
+                metadatas=list(store.metadatas),
+                ids=list(store.ids)
+            )
+            emb_snapshot = dict(self.emb_cache)
+            try:
+                log_covered = os.path.getsize(self._docs_log_path)
+            except OSError:
+                log_covered = 0
+
+        self._save_index(index)
+        self._save_documents(snapshot)
+        self._save_emb_cache(emb_snapshot)
+
+        with self._state_lock:
+            try:
+                with open(self._docs_log_path, 'rb') as f:
+                    f.seek(log_covered)
+                    tail = f.read()
+                with open(self._docs_log_path, 'wb') as f:
+                    f.write(tail)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.error(f"Error truncating docs log: {e}")
+
+    def _checkpoint_async(self) -> None:
+        """
+        Checkpoint on the background thread so the caller can start the
+        next encode instead of waiting on disk. At most one save is in
+        flight; the dirty flag carries anything it misses to the next.
+        """
+        if self._save_future is not None and not self._save_future.done():
+            return
+        self._save_future = self._io_pool.submit(self._write_snapshot)
+
+    def flush(self) -> None:
+        """
+        Synchronously checkpoint to disk if anything changed, waiting
+        out any in-flight background save first.
+        """
+        if self._save_future is not None and not self._save_future.done():
+            self._save_future.result()
+        if self._dirty:
+            self._write_snapshot()
+
+    def delete_ids(self, ids: List[int]) -> int:
+        """
+        Remove documents by stable ID without rebuilding the index.
+        Returns the number of vectors actually removed.
+        """
+        with self._state_lock:
+            known = sorted(
+                {int(doc_id) for doc_id in ids if int(doc_id) in self._row_of}
+            )
+            if not known:
+                return 0
+
+            try:
+                removed = self.index.remove_ids(
+                    np.asarray(known, dtype='int64')
+                )
+            except Exception as e:
+                logger.error(f"Error removing ids from index: {e}")
+                raise
+
+            # Drop the matching rows from the metadata columns
+            gone = {self._row_of[doc_id] for doc_id in known}
+            store = self.doc_store
+            keep = [row for row in range(len(store)) if row not in gone]
+            self.doc_store = DocStore(
+                contents=[store.contents[row] for row in keep],
+                sources=[store.sources[row] for row in keep],
+                metadatas=[store.metadatas[row] for row in keep],
+                ids=[store.ids[row] for row in keep]
+            )
+            self._row_of = {
+                doc_id: row for row, doc_id in enumerate(self.doc_store.ids)
+            }
+            self._dirty = True
+
+        self.flush()
+        logger.info("Removed %d documents from FAISS index", removed)
+        return int(removed)
+
     def delete_all(self) -> None:
         """Delete all documents and reset index."""
-        self.index = faiss.IndexFlatL2(self.dimension)
-        self.documents = []
-        self._save_index()
-        self._save_documents()
+        with self._state_lock:
+            self.index = self._to_device(self._new_index())
+            self.doc_store = DocStore()
+            self._row_of = {}
+            self._next_id = 0
+            self._train_buffer = []
+            self._dirty = True
+        self.flush()
         logger.info("Deleted all documents from FAISS index")
 
 